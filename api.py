@@ -1,16 +1,342 @@
-import requests
+import aiohttp
 import os
+import json
+import time
+import random
 import asyncio
 from dotenv import load_dotenv
 from typing import Tuple, Optional
 from logging import Logger
 from logging_config import setup_logger
+from metrics import API_LATENCY, API_BREAKER_STATE
 
 load_dotenv()
 
 MATCHA_API_URL = os.getenv("MATCHA_API_URL")
+MATCHA_API_TIMEOUT = float(os.getenv("MATCHA_API_TIMEOUT", "10"))         # seconds per call
+MATCHA_API_CONCURRENCY = int(os.getenv("MATCHA_API_CONCURRENCY", "10"))   # max in-flight calls
+REGION_CACHE_TTL = float(os.getenv("REGION_CACHE_TTL", "15"))             # seconds a region list snapshot stays fresh
+MATCHA_API_RETRIES = int(os.getenv("MATCHA_API_RETRIES", "2"))            # retries per call on errors/5xx
+MATCHA_API_BACKOFF = float(os.getenv("MATCHA_API_BACKOFF", "0.5"))        # base seconds of the exponential backoff
+MATCHA_API_BACKOFF_MAX = float(os.getenv("MATCHA_API_BACKOFF_MAX", "8"))  # cap of a single backoff
+MATCHA_API_RETRY_BUDGET = float(os.getenv("MATCHA_API_RETRY_BUDGET", "0.2"))        # retries earned per call
+MATCHA_API_BREAKER_THRESHOLD = int(os.getenv("MATCHA_API_BREAKER_THRESHOLD", "5"))  # consecutive failures to open
+MATCHA_API_BREAKER_COOLDOWN = float(os.getenv("MATCHA_API_BREAKER_COOLDOWN", "30")) # seconds open before probing
 logger: Logger = setup_logger()
 
+# Shared HTTP client, created lazily inside the running event loop
+_session: Optional[aiohttp.ClientSession] = None
+_limiter: Optional[asyncio.Semaphore] = None
+
+def GetSession() -> aiohttp.ClientSession:
+    """
+    Returns the shared keep-alive session used for every Matcha API call.
+    The session (and its concurrency limiter) is created on first use.
+    """
+    global _session, _limiter
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=MATCHA_API_CONCURRENCY,
+            keepalive_timeout=60,
+            ttl_dns_cache=300
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=MATCHA_API_TIMEOUT)
+        )
+        _limiter = asyncio.Semaphore(MATCHA_API_CONCURRENCY)
+    return _session
+
+async def CloseSession():
+    """
+    Closes the shared session, should be called once on shutdown.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def _request(method: str, path: str, timeout: float = None, **kwargs) -> Tuple[int, str]:
+    """
+    Performs a single request against the Matcha API through the shared session.
+
+    Args:
+        method (str): HTTP method
+        path (str): Path appended to MATCHA_API_URL (e.g. "/v1/resources/region/list")
+        timeout (float, optional): Overrides MATCHA_API_TIMEOUT for this call
+
+    Returns:
+        Tuple[int, str]: status code and response body
+
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError
+    """
+    session = GetSession()
+    call_timeout = aiohttp.ClientTimeout(total=timeout or MATCHA_API_TIMEOUT)
+
+    # The limiter queues callers locally so the timeout only covers the request itself
+    async with _limiter:
+        async with session.request(method, f"{MATCHA_API_URL}{path}", timeout=call_timeout, **kwargs) as response:
+            return response.status, await response.text()
+
+def _parseJSON(body: str):
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+# ------------------------------- RESILIENCE ------------------------------- #
+
+class CircuitOpenError(aiohttp.ClientError):
+    """
+    Raised instead of calling an endpoint whose circuit breaker is open.
+    """
+
+class CircuitBreaker:
+    """
+    Fails fast after MATCHA_API_BREAKER_THRESHOLD consecutive failures of an endpoint.
+    Once the cooldown is over a single probe request is let through (half-open),
+    its result closes or re-opens the breaker.
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.state = "closed" # closed | open | half-open
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+
+        if self.state == "open" and time.monotonic() - self.opened_at >= MATCHA_API_BREAKER_COOLDOWN:
+            self.state = "half-open"
+
+        if self.state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def success(self):
+        if self.state != "closed":
+            logger.info("Circuit breaker for %s closed", self.endpoint)
+        self.state = "closed"
+        self.failures = 0
+        self.probing = False
+
+    def failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.state == "half-open" or self.failures >= MATCHA_API_BREAKER_THRESHOLD:
+            if self.state != "open":
+                logger.warning("Circuit breaker for %s opened after %d failure(s)", self.endpoint, self.failures)
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # The probe was cancelled before getting an answer, let the next call probe instead
+        self.probing = False
+
+    def retryIn(self) -> float:
+        return max(0.0, MATCHA_API_BREAKER_COOLDOWN - (time.monotonic() - self.opened_at))
+
+class RetryBudget:
+    """
+    Every call earns MATCHA_API_RETRY_BUDGET retries, so during an outage retries
+    stay a fraction of the traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio: float, cap: float = 10.0):
+        self.ratio = ratio
+        self.cap = cap
+        self.tokens = cap
+
+    def deposit(self):
+        self.tokens = min(self.cap, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+_breakers = {} # type: dict[str, CircuitBreaker]
+_retry_budget = RetryBudget(MATCHA_API_RETRY_BUDGET)
+
+API_BREAKER_STATE.collector = lambda: {
+    (endpoint,): ("closed", "half-open", "open").index(breaker.state) for endpoint, breaker in _breakers.items()
+}
+
+def _breaker(endpoint: str) -> CircuitBreaker:
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        breaker = _breakers[endpoint] = CircuitBreaker(endpoint)
+    return breaker
+
+def _backoff(attempt: int) -> float:
+    # "full jitter", spreads the retries of concurrent callers
+    return random.uniform(0, min(MATCHA_API_BACKOFF_MAX, MATCHA_API_BACKOFF * 2 ** attempt))
+
+def GetBreakerStates() -> dict:
+    """
+    Returns:
+        dict: {endpoint: (state, seconds until the next probe)} for every breaker that isn't closed
+    """
+    return {
+        endpoint: (breaker.state, breaker.retryIn())
+        for endpoint, breaker in _breakers.items()
+        if breaker.state != "closed"
+    }
+
+async def _call(endpoint: str, method: str, path: str, idempotent: bool = True, retries: int = None, **kwargs) -> Tuple[int, str]:
+    """
+    _request behind the endpoint's circuit breaker, retrying errors and 5xx with jittered backoff.
+    Non-idempotent calls are only retried when the connection could not be established.
+
+    Returns:
+        Tuple[int, str]: status code and response body of the last attempt
+
+    Raises:
+        CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError
+    """
+    breaker = _breaker(endpoint)
+    retries = MATCHA_API_RETRIES if retries is None else retries
+    _retry_budget.deposit()
+
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} is unavailable, retrying in {breaker.retryIn():.0f}s")
+
+        try:
+            status, body = await _request(method, path, **kwargs)
+            if status < 500:
+                breaker.success()
+                return status, body
+
+            breaker.failure()
+            retryable = idempotent
+            error = None
+        except aiohttp.ClientConnectorError as e:
+            breaker.failure()
+            retryable = True # nothing was sent
+            error = e
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.failure()
+            retryable = idempotent
+            error = e
+        except asyncio.CancelledError:
+            breaker.release() # a half-open breaker would otherwise wait for this probe forever
+            raise
+        except Exception:
+            breaker.failure()
+            raise
+
+        if not retryable or attempt >= retries or not _retry_budget.withdraw():
+            if error is not None:
+                raise error
+            return status, body
+
+        delay = _backoff(attempt)
+        attempt += 1
+        logger.warning("Retrying %s in %.2fs (attempt %d/%d)", endpoint, delay, attempt, retries)
+        await asyncio.sleep(delay)
+
+# Region list snapshot shared by FetchBookableRegions and FetchBookableAvailability
+_region_snapshot: Optional[dict] = None
+_region_snapshot_at = 0.0       # time.monotonic() of the last successful fetch
+_region_requested_at = 0.0      # time.monotonic() at which the request behind the snapshot was sent
+_region_generation = 0          # bumped on every invalidation
+_region_inflight: Optional[asyncio.Task] = None
+
+@API_LATENCY.time("region_list")
+async def _refreshRegionSnapshot(generation: int) -> dict:
+    global _region_snapshot, _region_snapshot_at, _region_requested_at, _region_inflight
+    try:
+        requested = time.monotonic()
+        status, body = await _call("region_list", "GET", "/v1/resources/region/list")
+        if status != 200:
+            raise aiohttp.ClientError(f"Unexpected region list status {status}")
+
+        snapshot = json.loads(body)
+
+        # Don't let a fetch that started before an invalidation overwrite the cache
+        if generation == _region_generation:
+            _region_snapshot = snapshot
+            _region_snapshot_at = time.monotonic()
+            _region_requested_at = requested
+        return snapshot
+    finally:
+        if _region_inflight is asyncio.current_task():
+            _region_inflight = None
+
+async def FetchRegionSnapshot() -> dict:
+    """
+    Returns the raw /v1/resources/region/list document.
+    The document is cached for REGION_CACHE_TTL seconds and concurrent callers
+    share a single in-flight request.
+
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError, ValueError
+    """
+    global _region_inflight
+    if _region_snapshot is not None and time.monotonic() - _region_snapshot_at < REGION_CACHE_TTL:
+        return _region_snapshot
+
+    if _region_inflight is None:
+        _region_inflight = asyncio.ensure_future(_refreshRegionSnapshot(_region_generation))
+
+    # shield so a cancelled caller doesn't cancel the fetch for everybody else
+    return await asyncio.shield(_region_inflight)
+
+def InvalidateRegionCache():
+    """
+    Marks the region list snapshot as stale, should be called whenever occupancy changes.
+    """
+    global _region_snapshot_at, _region_generation, _region_inflight
+    _region_snapshot_at = 0.0
+    _region_generation += 1
+    _region_inflight = None
+
+def RegionSnapshotTime() -> float:
+    """
+    Returns:
+        float: time.monotonic() at which the cached region list was requested,
+               anything booked before that is already counted in its occupancy
+    """
+    return _region_requested_at
+
+def CachedRegionAvailability(provider: str = None) -> dict:
+    """
+    Free slots per region from the last fetched region list, without waiting for the API.
+    It may be stale, so it is meant for ranking suggestions rather than admitting bookings.
+
+    Args:
+        provider (str, optional): Only count the slots of this provider
+
+    Returns:
+        dict: {region code: free slots}, empty if the region list was never fetched
+    """
+    available = {}
+    for region_code, region_info in (_region_snapshot or {}).items():
+        for provider_info in region_info.get("providers", []):
+            if provider is None or provider_info.get("provider") == provider:
+                free = provider_info.get("quota", 0) - provider_info.get("occupied", 0)
+                available[region_code] = available.get(region_code, 0) + max(free, 0)
+    return available
+
+def _authHeaders() -> Optional[dict]:
+    bearer_token = os.getenv("MATCHA_API_TOKEN")
+    if not bearer_token:
+        return None
+
+    return {
+        "Authorization": f"Bearer {bearer_token}",
+        "Content-Type": "application/json"
+    }
+
+@API_LATENCY.time("FetchBookableRegions")
 async def FetchBookableRegions(provider: str):
     """
     Fetches bookable regions from the specified provider.
@@ -22,11 +348,7 @@ async def FetchBookableRegions(provider: str):
         list: A list of regions that have the specified provider available
     """
     try:
-        response = requests.get(f"{MATCHA_API_URL}/v1/resources/region/list")
-        response.raise_for_status()
-        
-        # Parse the JSON response
-        regions_data = response.json()
+        regions_data = await FetchRegionSnapshot()
         available_regions = []
         
         for region_code, region_info in regions_data.items():
@@ -42,13 +364,17 @@ async def FetchBookableRegions(provider: str):
         
         return available_regions
         
-    except requests.exceptions.RequestException as e:
+    except CircuitOpenError as e:
+        logger.warning("Error fetching regions: %s", e)
+        return []
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Error fetching regions: %s", e, exc_info=True)
         return []
     except Exception as e:
         logger.exception("Unexpected error while fetching regions")
         return []
 
+@API_LATENCY.time("FetchBookableAvailability")
 async def FetchBookableAvailability(provider: str, region: str = None):
     """
     Fetches bookable availability for a specific provider and region.
@@ -80,11 +406,7 @@ async def FetchBookableAvailability(provider: str, region: str = None):
         }
     """
     try:
-        response = requests.get(f"{MATCHA_API_URL}/v1/resources/region/list")
-        response.raise_for_status()
-        
-        # Parse the JSON response
-        regions_data = response.json()
+        regions_data = await FetchRegionSnapshot()
         availability_data = {}
         
         for region_code, region_info in regions_data.items():
@@ -110,14 +432,18 @@ async def FetchBookableAvailability(provider: str, region: str = None):
         
         return availability_data
         
-    except requests.exceptions.RequestException as e:
+    except CircuitOpenError as e:
+        logger.warning("Error fetching availability: %s", e)
+        return {}
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Error fetching availability: %s", e, exc_info=True)
         return {}
     except Exception:
         logger.exception("Unexpected error while fetching availability")
         return {}
     
-async def CreateMatchaBooking(discordid: str, region: str, provider: str = None) -> Tuple[int, Optional[requests.Response]]:
+@API_LATENCY.time("CreateMatchaBooking")
+async def CreateMatchaBooking(discordid: str, region: str, provider: str = None) -> Tuple[int, Optional[dict]]:
     """
     Creates a booking in the Matcha API.
     
@@ -127,7 +453,7 @@ async def CreateMatchaBooking(discordid: str, region: str, provider: str = None)
         provider (str, optional): Provider name (e.g. "google-cloud-platform")
         
     Returns:
-        Tuple[int, Optional[requests.Response]]:
+        Tuple[int, Optional[dict]]: status code and the parsed response body
         
     Status Codes:
         200: OK - Booking created successfully
@@ -148,39 +474,42 @@ async def CreateMatchaBooking(discordid: str, region: str, provider: str = None)
         if provider:
             payload["provider"] = provider
         
-        bearer_token = os.getenv("MATCHA_API_TOKEN")
-        if not bearer_token:
+        headers = _authHeaders()
+        if not headers:
             logger.error("MATCHA_API_TOKEN environment variable not set")
             return 0, None
         
-        headers = {
-            "Authorization": f"Bearer {bearer_token}",
-            "Content-Type": "application/json"
-        }
-        
         # post
-        response = requests.post(
-            f"{MATCHA_API_URL}/v1/matcha/createbooking",
+        status, body = await _call(
+            "createbooking",
+            "POST",
+            "/v1/matcha/createbooking",
+            idempotent=False,
             json=payload,
             headers=headers
         )
 
-        logger.info("Create booking response: status=%s body=%s", response.status_code, response.text)
+        logger.info("Create booking response: status=%s", status)
+        logger.debug("Create booking response body: %s", body)
         
-        if response.status_code in (401, 403):
+        if status in (401, 403):
             logger.error("API authentication failed - verify MATCHA_API_TOKEN is correct")
-        elif response.status_code >= 500:
-            logger.error("Matcha API server error - status %s", response.status_code)
+        elif status >= 500:
+            logger.error("Matcha API server error - status %s", status)
             
-        return response.status_code, response
+        return status, _parseJSON(body)
         
-    except requests.exceptions.RequestException as e:
+    except CircuitOpenError as e:
+        logger.warning("Request error creating booking: %s", e)
+        return 0, None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Request error creating booking: %s", e, exc_info=True)
         return 0, None
     except Exception:
         logger.exception("Unexpected error creating booking")
         return 0, None
 
+@API_LATENCY.time("StopMatchaBooking")
 async def StopMatchaBooking(bookingid: int) -> int:
     """
     Terminates the booking in Matcha API.
@@ -189,7 +518,7 @@ async def StopMatchaBooking(bookingid: int) -> int:
         bookingid (int): The bookingID of the bookable instance.
 
     Returns:
-        requests.Response
+        int: status code
 
     Status Codes:
         200: OK - Successful unbook
@@ -198,34 +527,98 @@ async def StopMatchaBooking(bookingid: int) -> int:
     """
 
     try:
-        bearer_token = os.getenv("MATCHA_API_TOKEN")
-        if not bearer_token:
+        headers = _authHeaders()
+        if not headers:
             return 0
-        
-        headers = {
-            "Authorization": f"Bearer {bearer_token}",
-            "Content-Type": "application/json"
-        }
 
-        response = requests.post(
-            f"{MATCHA_API_URL}/v1/matcha/endbooking?id={bookingid}",
+        status, body = await _call(
+            "endbooking",
+            "POST",
+            f"/v1/matcha/endbooking?id={bookingid}",
             headers=headers
         )
 
-        logger.info("End booking response: status=%s body=%s", response.status_code, response.text)
-        return response.status_code
+        logger.info("End booking response: status=%s", status)
+        logger.debug("End booking response body: %s", body)
+        return status
 
-    except requests.exceptions.RequestException as e:
+    except CircuitOpenError as e:
+        logger.warning("Request error stopping booking: %s", e)
+        return 0
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error("Request error stopping booking: %s", e, exc_info=True)
         return 0
     except Exception:
         logger.exception("Unexpected error stopping booking")
         return 0
     
+def ParseServerDetails(info: dict, bookingid: int, region: str = None) -> dict:
+    """
+    Builds the details dict used by sendServerDetails from a booking returned by /v1/resources/bookings/{id}
+    or from a started webhook, which share the same layout.
+
+    Args:
+        region (str, optional): Region of the booking, defaults to the one in `info` (webhooks don't carry it)
+    """
+    serverDetails = info.get("details", {})
+    return {
+        "address": serverDetails.get("address"),
+        "port": serverDetails.get("port"),
+        "stv_port": serverDetails.get("stv_port"),
+        "sdr_ipv4": serverDetails.get("sdr_ipv4"),
+        "sdr_port": serverDetails.get("sdr_port"),
+        "sv_password": serverDetails.get("sv_password"),
+        "instance": info.get("instance"),
+        "region": region or info.get("provider", {}).get("regionCode"),
+        "bookingid": bookingid
+    }
+
+@API_LATENCY.time("FetchBookingInfo")
+async def FetchBookingInfo(bookingid: int) -> Tuple[int, Optional[dict]]:
+    """
+    Fetches a single booking from the Matcha API.
+
+    Args:
+        bookingid (int): The bookingID of the bookable instance.
+
+    Returns:
+        Tuple[int, Optional[dict]]: status code and the booking (status, instance, details, provider...)
+
+    Status Codes:
+        200: OK - the booking is returned (None if it isn't part of the response)
+        404: BOOKING NOT FOUND
+        0: Error (API token not configured or request failed)
+    """
+    headers = _authHeaders()
+    if not headers:
+        logger.error("MATCHA_API_TOKEN not configured")
+        return 0, None
+
+    try:
+        status, body = await _call(
+            "bookings",
+            "GET",
+            f"/v1/resources/bookings/{bookingid}",
+            headers=headers
+        )
+
+        if status != 200:
+            return status, None
+
+        return status, (_parseJSON(body) or {}).get(str(bookingid))
+
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.error("Request error fetching booking %s: %s", bookingid, e)
+        return 0, None
+    except Exception:
+        logger.exception("Unexpected error fetching booking %s", bookingid)
+        return 0, None
+
+@API_LATENCY.time("manualDetailsCheck")
 async def manualDetailsCheck(bookingid: int) -> Optional[dict]:
     """
     Manually checks the booking details from Matcha API.
-    Retries up to 3 times with 20-second intervals if the request fails.
+    Errors are retried with backoff by the shared resilience layer (see _call).
 
     Args:
         bookingid (int): The bookingID of the bookable instance.
@@ -234,71 +627,24 @@ async def manualDetailsCheck(bookingid: int) -> Optional[dict]:
         Optional[dict]: Booking details dict or None if failed
             - If status is "started", details will contain server connection info
             - If status is "starting" with no details, booking has likely timed out
-            - Returns None on error or if not found after retries
+            - Returns None on error or if not found
     """
-    
-    bearer_token = os.getenv("MATCHA_API_TOKEN")
-    if not bearer_token:
-        logger.error("MATCHA_API_TOKEN not configured")
+    status, info = await FetchBookingInfo(bookingid)
+    logger.info("Manual details check for booking %s: status=%s", bookingid, status)
+
+    if status != 200:
+        logger.error("Failed to fetch booking details for booking %s (status %s)", bookingid, status)
         return None
-    
-    headers = {
-        "Authorization": f"Bearer {bearer_token}",
-        "Content-Type": "application/json"
-    }
 
-    for attempt in range(1, 4):
-        try:
-            response = requests.get(
-                f"{MATCHA_API_URL}/v1/resources/bookings/{bookingid}",
-                headers=headers
-            )
+    if not info:
+        logger.warning("Booking %s not found in response", bookingid)
+        return None
 
-            logger.info("Manual details check attempt %s: status=%s body=%s", attempt, response.status_code, response.text)
-            
-            if response.status_code == 200:
-                info = response.json().get(str(bookingid))
-                
-                if info:
-                    if info.get("status") == "started" and "details" in info:
-                        serverDetails = info.get("details", {})
-                        details = {
-                            "address": serverDetails.get("address"),
-                            "port": serverDetails.get("port"),
-                            "stv_port": serverDetails.get("stv_port"),
-                            "sdr_ipv4": serverDetails.get("sdr_ipv4"),
-                            "sdr_port": serverDetails.get("sdr_port"),
-                            "sv_password": serverDetails.get("sv_password"),
-                            "instance": info.get("instance"),
-                            "region": info.get("provider", {}).get("regionCode"),
-                            "bookingid": bookingid
-                        }
-                        return details
-                    elif info.get("status") == "starting" and "details" not in info:
-                        # Booking is still starting or has timed out
-                        logger.warning("Booking %s is in starting state without details - likely timed out", bookingid)
-                        return None
-                    else:
-                        return info
-                else:
-                    logger.warning("Booking %s not found in response", bookingid)
-            
-            if attempt < 3:
-                await asyncio.sleep(20)
-            else:
-                logger.error("Failed to fetch booking details after 3 attempts")
-                return None
-
-        except requests.exceptions.RequestException as e:
-            logger.error("Request error checking booking details (attempt %s/3): %s", attempt, e, exc_info=True)
-            if attempt < 3:
-                await asyncio.sleep(20)
-            else:
-                return None
-        except Exception:
-            logger.exception("Unexpected error checking booking details (attempt %s/3)", attempt)
-            if attempt < 3:
-                await asyncio.sleep(20)
-            else:
-                return None
-    return None
+    if info.get("status") == "started" and "details" in info:
+        return ParseServerDetails(info, bookingid)
+    elif info.get("status") == "starting" and "details" not in info:
+        # Booking is still starting or has timed out
+        logger.warning("Booking %s is in starting state without details - likely timed out", bookingid)
+        return None
+    else:
+        return info
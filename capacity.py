@@ -0,0 +1,101 @@
+import time
+from typing import Optional
+
+class RegionCapacity:
+    """
+    Per-region slot accounting on top of the cached availability snapshot.
+
+    A slot is reserved before calling CreateMatchaBooking and held while the call is in flight.
+    Once the booking is created it keeps counting against the region until a snapshot
+    requested after its creation (which already includes it in `occupied`) is used.
+    Reserving is synchronous, so two concurrent /book can't take the same last slot.
+    """
+
+    def __init__(self):
+        self._inflight = {}     # type: dict[str, int]          # region -> pending CreateMatchaBooking calls
+        self._created = {}      # type: dict[str, list[float]]  # region -> time.monotonic() of recent bookings
+
+    def pending(self) -> int:
+        """
+        Returns:
+            int: Reserved slots whose CreateMatchaBooking hasn't answered yet, across every region
+        """
+        return sum(self._inflight.values())
+
+    def _prune(self, region: str, snapshot_at: float):
+        created = self._created.get(region)
+        if created:
+            created[:] = [t for t in created if t >= snapshot_at]
+            if not created:
+                del self._created[region]
+
+    def available(self, availability: dict, snapshot_at: float, region: str) -> Optional[int]:
+        """
+        Args:
+            availability (dict): Result of api.FetchBookableAvailability
+            snapshot_at (float): api.RegionSnapshotTime() of that result
+
+        Returns:
+            Optional[int]: Free slots of the region, None if the region isn't in the snapshot
+        """
+        if region not in availability:
+            return None
+
+        self._prune(region, snapshot_at)
+        return (
+            availability[region]["available"]
+            - self._inflight.get(region, 0)
+            - len(self._created.get(region, ()))
+        )
+
+    def reserve(self, availability: dict, snapshot_at: float, region: str) -> bool:
+        """
+        Takes a slot in the region, must be followed by release().
+
+        Returns:
+            bool: False if the region is full, True if reserved (or unknown to the snapshot)
+        """
+        free = self.available(availability, snapshot_at, region)
+        if free is not None and free <= 0:
+            return False
+
+        self._inflight[region] = self._inflight.get(region, 0) + 1
+        return True
+
+    def release(self, region: str, created: bool):
+        """
+        Gives back a reserved slot once CreateMatchaBooking answered.
+
+        Args:
+            created (bool): The booking was created, keep counting it until the snapshot includes it
+        """
+        self._inflight[region] -= 1
+        if not self._inflight[region]:
+            del self._inflight[region]
+
+        if created:
+            self._created.setdefault(region, []).append(time.monotonic())
+
+    def suggest(self, availability: dict, snapshot_at: float, exclude: str = None) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: The region with the most free slots, None if every region is full
+        """
+        best, best_free = None, 0
+        for region in availability:
+            if region == exclude:
+                continue
+            free = self.available(availability, snapshot_at, region)
+            if free and free > best_free:
+                best, best_free = region, free
+        return best
+
+    def rank(self, availability: dict, snapshot_at: float, regions: list) -> list:
+        """
+        Returns:
+            list[str]: The regions with free slots, the most free first, followed by the regions
+                       missing from the snapshot in their given order (e.g. the region list couldn't be fetched)
+        """
+        free = {region: self.available(availability, snapshot_at, region) for region in regions}
+        known = sorted((region for region in regions if free[region]), key=lambda region: -free[region])
+        return known + [region for region in regions if free[region] is None]
@@ -0,0 +1,78 @@
+import os
+import json
+import asyncio
+import hashlib
+import discord
+from discord import app_commands
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+COMMAND_SYNC_PATH = os.getenv("COMMAND_SYNC_PATH", "command_sync.json")                 # fingerprints of the last synced trees
+COMMAND_SYNC_FORCE = os.getenv("COMMAND_SYNC_FORCE", "").lower() in ("1", "true", "yes") # sync once on start regardless
+
+_lock = asyncio.Lock()
+_forced = False # COMMAND_SYNC_FORCE is only applied to the first sync
+
+def Fingerprint(tree: app_commands.CommandTree, guild: discord.abc.Snowflake, application_id: int) -> str:
+    """
+    Stable hash of the command definitions uploaded by a sync, choices included.
+
+    Returns:
+        str: sha256 hex digest
+    """
+    commands = sorted((command.to_dict(tree) for command in tree.get_commands(guild=guild)), key=lambda c: c["name"])
+    payload = json.dumps({"application": application_id, "commands": commands}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def _load() -> dict:
+    try:
+        with open(COMMAND_SYNC_PATH) as sync_file:
+            return json.load(sync_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable command sync state '%s': %s", COMMAND_SYNC_PATH, e)
+        return {}
+
+def _save(synced: dict):
+    try:
+        temporary = f"{COMMAND_SYNC_PATH}.tmp"
+        with open(temporary, "w") as sync_file:
+            json.dump(synced, sync_file)
+        os.replace(temporary, COMMAND_SYNC_PATH)
+    except OSError as e:
+        logger.warning("Unable to save the command sync state '%s': %s", COMMAND_SYNC_PATH, e)
+
+async def SyncCommandTree(client: discord.Client, tree: app_commands.CommandTree, guild: discord.abc.Snowflake, force: bool = False) -> bool:
+    """
+    Syncs the commands of the guild, unless the same definitions were synced before.
+
+    Args:
+        force (bool): Sync even if the fingerprint is unchanged (e.g. commands were edited outside the bot)
+
+    Returns:
+        bool: True if the commands were uploaded
+    """
+    global _forced
+    async with _lock: # a reconnect's ready event and /sync can ask at the same time
+        if COMMAND_SYNC_FORCE and not _forced:
+            _forced = force = True
+
+        fingerprint = Fingerprint(tree, guild, client.application_id)
+        synced = _load() if COMMAND_SYNC_PATH else {}
+        key = str(guild.id)
+        if not force and synced.get(key) == fingerprint:
+            logger.info("Command tree unchanged, skipping sync")
+            return False
+
+        await tree.sync(guild=guild)
+        logger.info("Command tree synced (%s)", fingerprint[:12])
+
+        if COMMAND_SYNC_PATH:
+            synced[key] = fingerprint
+            await asyncio.to_thread(_save, synced)
+        return True
@@ -1,23 +1,49 @@
 # literally the only time i think oop is useful
-from requests import Response
+import time
+from typing import Optional, Callable
 from discord import WebhookMessage
+from store import BookingStore
+from state import BookingLeases
 
 class booking:
     """
     Represents a booking by user.
     """
     
-    def __init__(self, discordid: int, bookingid: int, region: str, msg: WebhookMessage):
+    def __init__(self, discordid: int, bookingid: int, region: str, msg: WebhookMessage, provider: str = None):
         self.discordID = discordid
         self.bookingID = bookingid
         self.region = region
+        self.provider = provider
         self.msg = msg
+        self.created = time.time()
 
         self.status = "starting" # type: str
+        self.delivering = False # the server details are being sent, see claimDelivery()
+        self.registry = None # type: Optional[BookingRegistry]
     
     def setStatus(self, status: str):
+        previous = self.status
         self.status = status
 
+        if self.registry is not None:
+            self.registry._statusChanged(self, previous, status)
+
+    def claimDelivery(self) -> bool:
+        """
+        Claims the delivery of the server details before awaiting it. The webhook, the sweeper and
+        the reconciler can all find the booking "starting" at once, only one of them may DM the user.
+        The claimer resets `delivering` once done, successful or not.
+
+        Returns:
+            bool: False if the booking isn't starting or is already being delivered
+        """
+        if self.status != "starting" or self.delivering:
+            return False
+
+        self.delivering = True
+        return True
+
     def getStatus(self):
         return self.status
 
@@ -26,7 +52,175 @@ class booking:
     
     def getRegion(self):
         return self.region
+
+    def getProvider(self):
+        return self.provider
     
     def getMessageObject(self):
         return self.msg
-    
\ No newline at end of file
+
+    def getBookingID(self):
+        return self.bookingID
+
+    def toRow(self) -> dict:
+        """
+        Returns the persistable part of the booking, the message object can't survive a restart.
+        """
+        return {
+            "bookingid": self.bookingID,
+            "discordid": self.discordID,
+            "region": self.region,
+            "provider": self.provider,
+            "status": self.status,
+            "channelid": self.msg.channel.id if self.msg else None,
+            "messageid": self.msg.id if self.msg else None,
+            "created": self.created
+        }
+
+    @classmethod
+    def fromRow(cls, row: dict) -> "booking":
+        entry = cls(row["discordid"], row["bookingid"], row["region"], None, row.get("provider"))
+        entry.created = row["created"] or entry.created
+        entry.status = row["status"]
+        return entry
+
+
+class BookingRegistry:
+    """
+    Tracks every booking made by this bot.
+    Bookings are indexed by booking ID, Discord user and provider, and the amount of
+    bookings per provider, region and status is kept up to date on every status change.
+    """
+
+    def __init__(self):
+        self.store = BookingStore()
+        self.leases = None      # type: Optional[BookingLeases] # shares our bookings with the other replicas
+        self.listener = None    # type: Optional[Callable[[], None]] # told about every status change, e.g. the status board
+        self._bookings = {}     # type: dict[int, booking]
+        self._byUser = {}       # type: dict[int, booking]
+        self._byProvider = {}   # type: dict[str, int] # provider -> amount of bookings
+        self._counts = {}       # type: dict[tuple[str, str, str], int] # (provider, region, status) -> amount of bookings
+        self._pending = set()   # type: set[int] # users with a /book request being processed
+
+    def __contains__(self, bookingid: int) -> bool:
+        return bookingid in self._bookings
+
+    def __getitem__(self, bookingid: int) -> booking:
+        return self._bookings[bookingid]
+
+    def __len__(self) -> int:
+        return len(self._bookings)
+
+    def __iter__(self):
+        return iter(list(self._bookings.values()))
+
+    def attach(self, store: BookingStore, provider: str = None) -> int:
+        """
+        Restores every booking from the store in a single pass and persists future changes into it.
+
+        Args:
+            provider (str, optional): Provider of the bookings stored before multi-provider mode
+
+        Returns:
+            int: Amount of restored bookings
+        """
+        self.store = BookingStore() # don't write the restored bookings back
+        for row in store.load():
+            entry = booking.fromRow(row)
+            entry.provider = entry.provider or provider
+            self.add(entry)
+
+        self.store = store
+        return len(self._bookings)
+
+    def add(self, entry: booking):
+        """
+        Starts tracking a booking, replacing any booking with the same ID.
+        """
+        self.remove(entry.getBookingID())
+
+        self._bookings[entry.getBookingID()] = entry
+        self._byUser[entry.getDiscordID()] = entry
+        self._byProvider[entry.getProvider()] = self._byProvider.get(entry.getProvider(), 0) + 1
+        entry.registry = self
+        self._statusChanged(entry, None, entry.getStatus())
+
+    def remove(self, bookingid: int) -> Optional[booking]:
+        """
+        Stops tracking a booking.
+
+        Returns:
+            Optional[booking]: The removed booking, None if it wasn't tracked
+        """
+        entry = self._bookings.pop(bookingid, None)
+        if entry is None:
+            return None
+
+        if self._byUser.get(entry.getDiscordID()) is entry:
+            del self._byUser[entry.getDiscordID()]
+
+        self._byProvider[entry.getProvider()] -= 1
+        if not self._byProvider[entry.getProvider()]:
+            del self._byProvider[entry.getProvider()]
+
+        entry.registry = None
+        self._statusChanged(entry, entry.getStatus(), None)
+        return entry
+
+    def get(self, bookingid: int) -> Optional[booking]:
+        return self._bookings.get(bookingid)
+
+    def getByUser(self, discordid: int) -> Optional[booking]:
+        return self._byUser.get(discordid)
+
+    def countByProvider(self, provider: str) -> int:
+        return self._byProvider.get(provider, 0)
+
+    def countByRegionAndStatus(self) -> dict:
+        """
+        Returns:
+            dict: {(provider, region, status): amount of bookings}
+        """
+        return dict(self._counts)
+
+    def reserveUser(self, discordid: int) -> bool:
+        """
+        Marks a user as having a /book request being processed.
+
+        Returns:
+            bool: False if the user already has a request being processed
+        """
+        if discordid in self._pending:
+            return False
+
+        self._pending.add(discordid)
+        return True
+
+    def releaseUser(self, discordid: int):
+        self._pending.discard(discordid)
+
+    def _statusChanged(self, entry: booking, previous: Optional[str], status: Optional[str]):
+        if status is None:
+            self.store.delete(entry.getBookingID())
+        else:
+            self.store.save(entry.toRow())
+
+        if self.leases is not None:
+            if previous is None:
+                self.leases.track(entry.getBookingID(), entry.getProvider() or "")
+            elif status is None:
+                self.leases.untrack(entry.getBookingID())
+
+        # The provider and region of a tracked booking never change, only its status
+        if previous is not None:
+            key = (entry.getProvider() or "", entry.getRegion(), previous)
+            self._counts[key] -= 1
+            if not self._counts[key]:
+                del self._counts[key]
+
+        if status is not None:
+            key = (entry.getProvider() or "", entry.getRegion(), status)
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+        if self.listener is not None:
+            self.listener()
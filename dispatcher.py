@@ -0,0 +1,119 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+BOOKING_DISPATCH_RATE = float(os.getenv("BOOKING_DISPATCH_RATE", "2"))                  # bookings let through per second, 0 for no limit
+BOOKING_DISPATCH_CONCURRENCY = int(os.getenv("BOOKING_DISPATCH_CONCURRENCY", "3"))      # bookings being created at once
+BOOKING_QUEUE_UPDATE_INTERVAL = float(os.getenv("BOOKING_QUEUE_UPDATE_INTERVAL", "3"))  # seconds between queue position updates
+
+class BookingDispatcher:
+    """
+    FIFO queue in front of CreateMatchaBooking.
+    Requests are let through in order, at most `rate` per second and `concurrency` at once,
+    so a burst of /book is smoothed out instead of hitting the API all at the same moment.
+    """
+
+    def __init__(self, rate: float = BOOKING_DISPATCH_RATE, concurrency: int = BOOKING_DISPATCH_CONCURRENCY):
+        self.interval = 1 / rate if rate > 0 else 0.0
+        self.concurrency = concurrency
+
+        self._waiting = deque()     # type: deque[asyncio.Future]
+        self._active = 0
+        self._next_at = 0.0         # time.monotonic() at which the next request may go through
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return len(self._waiting)
+
+    def position(self, ticket: asyncio.Future) -> int:
+        """
+        Returns:
+            int: 1-based position of the ticket in the queue, 0 if it isn't queued
+        """
+        try:
+            return self._waiting.index(ticket) + 1
+        except ValueError:
+            return 0
+
+    def _grant(self, ticket: asyncio.Future, now: float):
+        self._active += 1
+        self._next_at = max(now, self._next_at) + self.interval
+        ticket.set_result(None)
+
+    def _pump(self):
+        self._timer = None
+        now = time.monotonic()
+        while self._waiting and self._active < self.concurrency:
+            if now < self._next_at:
+                self._timer = asyncio.get_running_loop().call_later(self._next_at - now, self._pump)
+                return
+
+            ticket = self._waiting.popleft()
+            if not ticket.done():
+                self._grant(ticket, now)
+
+    async def acquire(self, on_position=None):
+        """
+        Waits for the turn of the caller, release() must be called afterwards.
+
+        Args:
+            on_position: Optional async function receiving the queue position,
+                         called when queued and then every BOOKING_QUEUE_UPDATE_INTERVAL if it changed
+        """
+        loop = asyncio.get_running_loop()
+        ticket = loop.create_future()
+
+        # Nobody waiting and a slot free, go straight through
+        now = time.monotonic()
+        if not self._waiting and self._active < self.concurrency and now >= self._next_at:
+            self._grant(ticket, now)
+            return
+
+        self._waiting.append(ticket)
+        if self._timer is None:
+            self._pump()
+
+        try:
+            last = 0
+            while not ticket.done():
+                position = self.position(ticket)
+                if on_position is not None and position != last:
+                    last = position
+                    try:
+                        await on_position(position)
+                    except Exception:
+                        logger.exception("Failed to update the booking queue position")
+
+                if not ticket.done():
+                    await asyncio.wait({ticket}, timeout=BOOKING_QUEUE_UPDATE_INTERVAL)
+
+        except asyncio.CancelledError:
+            if ticket.done():
+                self.release(dispatched=False)  # granted right as the caller went away
+            else:
+                ticket.cancel()
+                self._waiting.remove(ticket)
+            raise
+
+    def release(self, dispatched: bool = True):
+        """
+        Args:
+            dispatched (bool): False if no booking was sent to the API, gives the rate slot back
+        """
+        self._active -= 1
+        if not dispatched:
+            self._next_at = max(time.monotonic(), self._next_at - self.interval)
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        if self._timer is None:
+            self._pump()
@@ -0,0 +1,188 @@
+# Offline end-to-end benchmark of the /status, /book and /unbook commands
+#
+#   python helper/benchmark.py --users 50 --latency 0.05 --failure-rate 0.05
+#
+# Runs a fake Matcha API and drives the real command callbacks from main.py with fake
+# Discord interactions, the started webhooks go through the real webhook server.
+
+import os, sys, time, asyncio, argparse, tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fakes import free_port, percentile
+
+PROVIDER = "benchmark-provider"
+
+def configure_environment(args) -> int:
+    """
+    main.py reads its configuration at import time, so this has to run before importing it.
+
+    Returns:
+        int: port of the fake Matcha API
+    """
+    api_port = free_port()
+    webhook_port = free_port()
+    os.environ.update({
+        "BOT_TOKEN": "benchmark",
+        "MATCHA_API_TOKEN": "benchmark",
+        "MATCHA_API_URL": f"http://127.0.0.1:{api_port}",
+        "PROVIDER": PROVIDER,
+        "PROVIDER_NAME": "Benchmark",
+        "WEBHOOK_PORT": str(webhook_port),
+        "WEBHOOK_URL": f"http://127.0.0.1:{webhook_port}/webhook",
+        "WEBHOOK_BEARER": "benchmark",
+        "GUILD": "1",
+        "CHANNEL_ID": "2",
+        "MAX_BOOKABLE": str(args.max_bookable or args.users),
+        "BOOKING_STORE": "memory",
+        "BOOKING_DISPATCH_RATE": str(args.dispatch_rate),
+        "BOOKING_DISPATCH_CONCURRENCY": str(args.dispatch_concurrency or args.users),
+        "LOG_LEVEL": args.log_level,
+        "LOG_FILE": os.path.join(tempfile.gettempdir(), "bookable-benchmark.log")
+    })
+    return api_port
+
+class Results:
+    def __init__(self):
+        self.rows = {}
+
+    def add(self, name: str, samples: list, ok: int, elapsed: float):
+        self.rows[name] = (samples, ok, elapsed)
+
+    def print(self):
+        print(f"{'stage':<12}{'count':>8}{'ok':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'ops/s':>10}")
+        for name, (samples, ok, elapsed) in self.rows.items():
+            print(
+                f"{name:<12}{len(samples):>8}{ok:>8}"
+                f"{percentile(samples, 50) * 1000:>10.1f}{percentile(samples, 99) * 1000:>10.1f}"
+                f"{(max(samples) if samples else 0) * 1000:>10.1f}"
+                f"{(len(samples) / elapsed if elapsed else 0):>10.1f}"
+            )
+
+async def timed(coro) -> float:
+    started = time.perf_counter()
+    await coro
+    return time.perf_counter() - started
+
+async def run(args):
+    api_port = configure_environment(args)
+
+    import main
+    import api
+    import webhook
+    from fakes import FakeMatchaAPI, FakeInteraction, FakeUser, FakeChannel
+
+    regions = {f"r{i:02d}": (f"Region {i}", args.quota) for i in range(args.regions)}
+    backend = FakeMatchaAPI(
+        PROVIDER, regions,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        start_delay=args.start_delay,
+        webhook_drop_rate=args.drop_rate
+    )
+    await backend.start(api_port)
+
+    # Fake the Discord side of the client
+    channel = FakeChannel(int(os.environ["CHANNEL_ID"]))
+    users = {}
+
+    async def ready():
+        return None
+
+    async def fetch_user(userid):
+        return users[userid]
+
+    async def fetch_channel(channelid):
+        return channel
+
+    main.client.wait_until_ready = ready
+    main.client.get_user = users.get
+    main.client.fetch_user = fetch_user
+    main.client.fetch_channel = fetch_channel
+
+    # Same start-up as run_bot, minus the gateway
+    for provider in main.PROVIDERS.values():
+        provider.regions = await api.FetchBookableRegions(provider.code)
+    main.regions.update(main.PROVIDERS)
+
+    cog = webhook.WebhookServer(main.client)
+    cog.set_globals(main.booker, main.sendServerDetails, main.ServerIsEmpty)
+    cog.set_state(main.state, main.REPLICA_URL)
+    await cog.webserver()
+
+    # Bookings whose webhook was dropped are picked up by the sweeper
+    main.BOOKING_TIMEOUT = args.booking_timeout
+    sweeper = asyncio.create_task(main.sweeper.run())
+    leases = asyncio.create_task(main.leases.run())
+
+    results = Results()
+    codes = list(regions)
+
+    for round_number in range(args.rounds):
+        round_users = [FakeUser(10_000 + round_number * args.users + i, args.discord_latency) for i in range(args.users)]
+        users.update({user.id: user for user in round_users})
+
+        # /status
+        interactions = [FakeInteraction(user, channel, args.discord_latency) for user in round_users]
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(timed(main.status.callback(i)) for i in interactions))
+        ok = sum(1 for i in interactions if i.message.embeds[-1].fields)
+        results.add("status", samples, ok, time.perf_counter() - started)
+
+        # /book
+        interactions = [FakeInteraction(user, channel, args.discord_latency) for user in round_users]
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(
+            timed(main.book.callback(i, codes[n % len(codes)])) for n, i in enumerate(interactions)
+        ))
+        booked = [i for i in interactions if i.user.id in {b.getDiscordID() for b in main.booker}]
+        results.add("book", samples, len(booked), time.perf_counter() - started)
+
+        # time until the server details reached the user
+        deadline = time.perf_counter() + args.booking_timeout + args.ready_timeout
+        while any(b.getStatus() == "starting" for b in main.booker) and time.perf_counter() < deadline:
+            await asyncio.sleep(0.01)
+        ready_samples = [i.user.dm_at - started for i in booked if i.user.dm_at is not None]
+        results.add("ready", ready_samples, len(ready_samples), time.perf_counter() - started)
+
+        # /unbook
+        interactions = [FakeInteraction(i.user, channel, args.discord_latency) for i in booked]
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(timed(main.unbook.callback(i)) for i in interactions))
+        ok = sum(1 for i in interactions if "closed" in i.message.description)
+        results.add("unbook", samples, ok, time.perf_counter() - started)
+
+        print(f"--- round {round_number + 1}/{args.rounds} ({args.users} users)")
+        results.print()
+
+    print(f"--- fake Matcha API calls: {backend.calls}, webhooks sent: {backend.webhooks_sent}")
+
+    sweeper.cancel()
+    leases.cancel()
+    cog.cog_unload()
+    await api.CloseSession()
+    await backend.stop()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark for the bookable commands")
+    parser.add_argument("--users", type=int, default=20, help="concurrent users per round")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--regions", type=int, default=5)
+    parser.add_argument("--quota", type=int, default=100, help="servers per region")
+    parser.add_argument("--max-bookable", type=int, default=0, help="MAX_BOOKABLE, defaults to --users")
+    parser.add_argument("--dispatch-rate", type=float, default=0, help="BOOKING_DISPATCH_RATE, 0 for no limit")
+    parser.add_argument("--dispatch-concurrency", type=int, default=0, help="BOOKING_DISPATCH_CONCURRENCY, defaults to --users")
+    parser.add_argument("--latency", type=float, default=0.02, help="fake Matcha API latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability of a 500 from the fake API")
+    parser.add_argument("--start-delay", type=float, default=0.1, help="seconds before a booking sends its started webhook")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="probability of a started webhook never being sent")
+    parser.add_argument("--booking-timeout", type=float, default=2.0, help="BOOKING_TIMEOUT used for the run, in seconds")
+    parser.add_argument("--discord-latency", type=float, default=0.0, help="latency of fake Discord calls in seconds")
+    parser.add_argument("--ready-timeout", type=float, default=30.0)
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,307 @@
+# Offline stand-ins for the Matcha API and Discord, and helpers shared by the benchmark scripts
+
+import time
+import random
+import socket
+import asyncio
+from aiohttp import web, ClientSession
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def rss_mb() -> float:
+    import memory # late, it configures the logger from the environment the scripts set up first
+    rss = memory._rssMB()
+    if rss is not None:
+        return rss
+
+    # no /proc, the peak RSS is the closest
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class FakeMatchaAPI:
+    """
+    Local aiohttp stand-in for the Matcha API.
+    Bookings "start" after `start_delay` seconds, at which point the started webhook
+    is sent to the URL given in the createbooking payload.
+    """
+
+    def __init__(self, provider: str, regions: dict, latency: float = 0.0, failure_rate: float = 0.0,
+                 start_delay: float = 0.1, webhook_drop_rate: float = 0.0):
+        """
+        Args:
+            provider (str): Provider the regions are served for
+            regions (dict): {region code: (name, quota)}
+            latency (float): Seconds added to every response
+            failure_rate (float): Probability of answering 500 to createbooking/endbooking
+            start_delay (float): Seconds between createbooking and the started webhook
+            webhook_drop_rate (float): Probability of never sending the started webhook
+        """
+        self.provider = provider
+        self.regions = {code: {"name": name, "quota": quota, "occupied": 0} for code, (name, quota) in regions.items()}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.start_delay = start_delay
+        self.webhook_drop_rate = webhook_drop_rate
+
+        self.bookings = {}  # bookingID -> dict
+        self.calls = {}     # route -> amount of requests
+        self.webhooks_sent = 0
+        self._next_id = 1000
+        self._runner = None
+        self._session = None
+        self._tasks = set()
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/v1/resources/region/list", self.region_list)
+        app.router.add_post("/v1/matcha/createbooking", self.create_booking)
+        app.router.add_post("/v1/matcha/endbooking", self.end_booking)
+        app.router.add_get("/v1/resources/bookings/{id}", self.get_booking)
+        return app
+
+    async def start(self, port: int):
+        self._session = ClientSession()
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        if self._runner:
+            await self._runner.cleanup()
+        if self._session:
+            await self._session.close()
+
+    async def _respond(self, route: str):
+        self.calls[route] = self.calls.get(route, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _failed(self) -> bool:
+        return random.random() < self.failure_rate
+
+    async def region_list(self, request):
+        await self._respond("region_list")
+        return web.json_response({
+            code: {
+                "regionName": region["name"],
+                "providers": [{
+                    "provider": self.provider,
+                    "zone": f"{code}-zone",
+                    "quota": region["quota"],
+                    "occupied": region["occupied"]
+                }]
+            }
+            for code, region in self.regions.items()
+        })
+
+    async def create_booking(self, request):
+        await self._respond("createbooking")
+        if self._failed():
+            return web.json_response({"error": "Internal server error"}, status=500)
+
+        payload = await request.json()
+        discordid = payload["discordid"]
+        region = self.regions.get(payload["regionCode"])
+
+        if any(b["discordid"] == discordid and b["status"] != "ended" for b in self.bookings.values()):
+            return web.json_response({"error": "Duplicated booking"}, status=301)
+        if region is None or region["occupied"] >= region["quota"]:
+            return web.json_response({"error": "Region is full"}, status=302)
+
+        region["occupied"] += 1
+        self._next_id += 1
+        bookingid = self._next_id
+        self.bookings[bookingid] = {
+            "discordid": discordid,
+            "region": payload["regionCode"],
+            "status": "starting",
+            "webhook": payload.get("webhook", {})
+        }
+
+        if random.random() >= self.webhook_drop_rate:
+            task = asyncio.create_task(self._start_later(bookingid))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        return web.json_response({"booking": {"bookingID": bookingid}})
+
+    async def end_booking(self, request):
+        await self._respond("endbooking")
+        if self._failed():
+            return web.json_response({"error": "Internal server error"}, status=500)
+
+        booking = self.bookings.get(int(request.query.get("id", 0)))
+        if booking is None or booking["status"] == "ended":
+            return web.json_response({"error": "Booking not found"}, status=404)
+
+        self._end(booking)
+        return web.json_response({"message": "Booking ended"})
+
+    async def get_booking(self, request):
+        await self._respond("bookings")
+        bookingid = request.match_info["id"]
+        booking = self.bookings.get(int(bookingid))
+        if booking is None:
+            return web.json_response({"error": "Booking not found"}, status=404)
+
+        return web.json_response({bookingid: self._describe(int(bookingid), booking)})
+
+    def _describe(self, bookingid: int, booking: dict) -> dict:
+        info = {
+            "status": booking["status"],
+            "instance": f"fake-{bookingid}",
+            "provider": {"regionCode": booking["region"]}
+        }
+        if booking["status"] == "started":
+            info["details"] = {
+                "address": "127.0.0.1",
+                "port": 27015,
+                "stv_port": 27020,
+                "sdr_ipv4": "127.0.0.2",
+                "sdr_port": 27015,
+                "sv_password": "bench"
+            }
+        return info
+
+    def _end(self, booking: dict):
+        booking["status"] = "ended"
+        self.regions[booking["region"]]["occupied"] -= 1
+
+    async def _start_later(self, bookingid: int):
+        await asyncio.sleep(self.start_delay)
+        booking = self.bookings[bookingid]
+        if booking["status"] != "starting":
+            return
+
+        booking["status"] = "started"
+        await self.send_webhook(bookingid, {"bookingID": bookingid, **self._describe(bookingid, booking)})
+
+    async def send_webhook(self, bookingid: int, data: dict) -> int:
+        """
+        Delivers a webhook for the booking, like the Matcha API does.
+
+        Returns:
+            int: status code answered by the bot
+        """
+        webhook = self.bookings[bookingid]["webhook"]
+        headers = {}
+        if webhook.get("bearer"):
+            headers["Authorization"] = f"Bearer {webhook['bearer']}"
+
+        self.webhooks_sent += 1
+        async with self._session.post(webhook["url"], json=data, headers=headers) as response:
+            return response.status
+
+    async def empty(self, bookingid: int) -> int:
+        """
+        Closes a booking for inactivity and sends the empty webhook.
+        """
+        booking = self.bookings[bookingid]
+        self._end(booking)
+        return await self.send_webhook(bookingid, {"bookingID": bookingid, "status": "empty"})
+
+# ------------------------------- DISCORD ------------------------------- #
+
+class FakeChannel:
+    def __init__(self, channelid: int):
+        self.id = channelid
+        self.sent = []
+
+    async def send(self, content: str = None, embed=None, **kwargs):
+        self.sent.append((content, embed))
+        return FakeMessage(self)
+
+class FakeMessage:
+    _next_id = 1
+
+    def __init__(self, channel: FakeChannel, latency: float = 0.0):
+        self.id = FakeMessage._next_id
+        FakeMessage._next_id += 1
+        self.channel = channel
+        self.latency = latency
+        self.embeds = []
+        self.edited_at = None
+
+    async def edit(self, content: str = None, embed=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.embeds.append(embed)
+        self.edited_at = time.perf_counter()
+        return self
+
+    @property
+    def description(self) -> str:
+        return self.embeds[-1].description if self.embeds and self.embeds[-1] else ""
+
+class FakeUser:
+    def __init__(self, userid: int, latency: float = 0.0):
+        self.id = userid
+        self.mention = f"<@{userid}>"
+        self.latency = latency
+        self.dms = []
+        self.dm_at = None
+
+    async def send(self, content: str = None, embed=None, **kwargs):
+        import discord
+
+        if content is None and embed is None:
+            # Same answer Discord gives to the empty message /book uses to probe DMs
+            raise discord.HTTPException(_FakeResponse(400), "Cannot send an empty message")
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.dms.append(embed)
+        self.dm_at = time.perf_counter()
+
+class _FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "Bad Request"
+
+class _FakeResponseHandle:
+    async def defer(self, *args, **kwargs):
+        pass
+
+    def is_done(self) -> bool:
+        return True
+
+class _FakeFollowup:
+    def __init__(self, channel: FakeChannel, latency: float):
+        self.channel = channel
+        self.latency = latency
+        self.messages = []
+
+    async def send(self, content: str = None, embed=None, wait: bool = False, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        msg = FakeMessage(self.channel, self.latency)
+        msg.embeds.append(embed)
+        self.messages.append(msg)
+        return msg
+
+class FakeInteraction:
+    """
+    Just enough of discord.Interaction for the slash command callbacks in main.py.
+    """
+
+    def __init__(self, user: FakeUser, channel: FakeChannel, latency: float = 0.0):
+        self.user = user
+        self.channel = channel
+        self.response = _FakeResponseHandle()
+        self.followup = _FakeFollowup(channel, latency)
+
+    @property
+    def message(self) -> FakeMessage:
+        return self.followup.messages[-1]
@@ -0,0 +1,105 @@
+# Stand-in for the shared state service used by STATE_BACKEND=http
+#
+#   python helper/state_server.py --port 8700 --token TOKEN
+#
+# Serves the protocol of state.HTTPStateBackend from a MemoryStateBackend, so several
+# replicas of the bot can be run locally against one state. Not meant for production,
+# the state is lost when the process exits.
+
+import os, sys, asyncio, argparse
+from aiohttp import web
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from state import MemoryStateBackend, STATE_LEASE_TTL, STATE_RESERVATION_TTL
+
+class StateServer:
+    """
+    aiohttp server exposing a MemoryStateBackend:
+
+        POST /reserve {scope, limit, ttl}           -> {token}
+        POST /cancel  {token}                       -> {}
+        POST /lease   {bookingid, owner, scope, ttl} -> {ok}
+        POST /release {bookingid, owner}            -> {}
+        GET  /owner/{bookingid}                     -> {owner}
+        GET  /count/{scope}                         -> {count}
+    """
+
+    def __init__(self, token: str = ""):
+        self.token = token
+        self.backend = MemoryStateBackend()
+        self._runner = None
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.auth])
+        app.router.add_post("/reserve", self.reserve)
+        app.router.add_post("/cancel", self.cancel)
+        app.router.add_post("/lease", self.lease)
+        app.router.add_post("/release", self.release)
+        app.router.add_get("/owner/{bookingid}", self.owner)
+        app.router.add_get("/count/{scope}", self.count)
+        return app
+
+    async def start(self, port: int):
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, "127.0.0.1", port).start()
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def auth(self, request, handler):
+        if self.token and request.headers.get("Authorization", "") != f"Bearer {self.token}":
+            return web.json_response({"error": "Unauthorized"}, status=401)
+        return await handler(request)
+
+    async def reserve(self, request):
+        data = await request.json()
+        token = await self.backend.reserve(data["scope"], int(data["limit"]), float(data.get("ttl", STATE_RESERVATION_TTL)))
+        return web.json_response({"token": token})
+
+    async def cancel(self, request):
+        data = await request.json()
+        await self.backend.cancel(data["token"])
+        return web.json_response({})
+
+    async def lease(self, request):
+        data = await request.json()
+        ok = await self.backend.lease(int(data["bookingid"]), data["owner"], data["scope"], float(data.get("ttl", STATE_LEASE_TTL)))
+        return web.json_response({"ok": ok})
+
+    async def release(self, request):
+        data = await request.json()
+        await self.backend.release(int(data["bookingid"]), data["owner"])
+        return web.json_response({})
+
+    async def owner(self, request):
+        owner = await self.backend.owner(int(request.match_info["bookingid"]))
+        return web.json_response({"owner": owner})
+
+    async def count(self, request):
+        count = await self.backend.count(request.match_info["scope"])
+        return web.json_response({"count": count})
+
+async def run(args):
+    server = StateServer(args.token)
+    await server.start(args.port)
+    print(f"State server listening on 127.0.0.1:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Shared state stand-in for running several replicas")
+    parser.add_argument("--port", type=int, default=8700)
+    parser.add_argument("--token", default="", help="bearer the replicas must send (STATE_BACKEND_TOKEN)")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(run(parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,266 @@
+# Load generator and soak test for the webhook server
+#
+#   python helper/webhook_loadgen.py --rate 500 --duration 60
+#   python helper/webhook_loadgen.py --burst 5000
+#   python helper/webhook_loadgen.py --url https://bot.example/webhook --bearer TOKEN --rate 100
+#
+# By default the real WebhookServer runs in-process with a booking registry that is filled
+# the same way /book fills it, so the registry size and RSS of the server can be tracked.
+# Every booking sends "started" then "empty", optionally duplicated, out of order, or
+# mixed with events for unknown booking IDs. Exits with 1 if the registry or RSS keeps growing.
+
+import os, sys, time, random, asyncio, argparse, tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from aiohttp import ClientSession, ClientError, TCPConnector
+from fakes import free_port, percentile, rss_mb
+
+RESERVOIR_SIZE = 50_000
+
+class FakeBot:
+    async def wait_until_ready(self):
+        return None
+
+class LoadGenerator:
+    def __init__(self, args, url: str, registry=None, server=None):
+        self.args = args
+        self.url = url
+        self.registry = registry    # in-process only
+        self.server = server        # in-process only
+        self.headers = {"Authorization": f"Bearer {args.bearer}"} if args.bearer else {}
+
+        self.next_id = 1
+        self.sent = 0
+        self.retried = 0
+        self.statuses = {}          # status code (or "error") -> count
+        self.latencies = []         # accept latency of the current interval
+        self.all_latencies = []     # reservoir sample of the whole run
+        self.samples = []           # (elapsed, rss, registry size)
+        self.limiter = asyncio.Semaphore(args.concurrency)
+        self.session = None
+
+    async def post(self, data: dict):
+        """
+        Delivers one event, retrying 503s after their Retry-After like the Matcha API would.
+        """
+        for attempt in range(self.args.retries + 1):
+            retry_after = None
+            async with self.limiter:
+                started = time.perf_counter()
+                try:
+                    async with self.session.post(self.url, json=data, headers=self.headers) as response:
+                        await response.read()
+                        key = response.status
+                        retry_after = response.headers.get("Retry-After")
+                except (ClientError, asyncio.TimeoutError):
+                    key = "error"
+
+                latency = time.perf_counter() - started
+                self.sent += 1
+                self.statuses[key] = self.statuses.get(key, 0) + 1
+                self.latencies.append(latency)
+                self.record(latency)
+
+            if key != 503 or attempt == self.args.retries:
+                return
+
+            self.retried += 1
+            await asyncio.sleep(float(retry_after or 1))
+
+    def record(self, latency: float):
+        """
+        Reservoir sample of every latency, bounded so the tool itself doesn't grow the RSS it measures.
+        """
+        if len(self.all_latencies) < RESERVOIR_SIZE:
+            self.all_latencies.append(latency)
+        else:
+            index = random.randrange(self.sent)
+            if index < RESERVOIR_SIZE:
+                self.all_latencies[index] = latency
+
+    def events_for_booking(self, bookingid: int) -> list:
+        started = {
+            "bookingID": bookingid,
+            "status": "started",
+            "instance": f"loadgen-{bookingid}",
+            "details": {"address": "127.0.0.1", "port": 27015, "sv_password": "loadgen"}
+        }
+        empty = {"bookingID": bookingid, "status": "empty"}
+
+        events = [started, empty]
+        if random.random() < self.args.reorder_rate:
+            events.reverse()
+        if random.random() < self.args.duplicate_rate:
+            events.insert(random.randint(1, len(events)), dict(random.choice(events)))
+        return events
+
+    async def lifecycle(self):
+        """
+        One booking: registered like /book does, then its webhooks are delivered in order.
+        """
+        bookingid = self.next_id
+        self.next_id += 1
+
+        if self.registry is not None:
+            from details import booking
+            self.registry.add(booking(bookingid, bookingid, "loadgen", None))
+
+        for data in self.events_for_booking(bookingid):
+            await self.post(data)
+
+        if random.random() < self.args.unknown_rate:
+            await self.post({"bookingID": 10_000_000 + bookingid, "status": random.choice(("started", "empty"))})
+
+    async def burst(self, amount: int):
+        await asyncio.gather(*(self.lifecycle() for _ in range(amount)))
+
+    async def sustained(self, rate: float, duration: float):
+        """
+        Starts `rate` events per second worth of bookings (two events each) for `duration` seconds.
+        """
+        tasks = set()
+        started = time.perf_counter()
+        interval = 2 / rate if rate else 0
+        next_report = started + 1
+
+        while time.perf_counter() - started < duration:
+            task = asyncio.create_task(self.lifecycle())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+            if interval:
+                await asyncio.sleep(interval)
+            else:
+                # flat out, as fast as the limiter lets requests through
+                while len(tasks) >= self.args.concurrency:
+                    await asyncio.sleep(0)
+                await asyncio.sleep(0)
+
+            if time.perf_counter() >= next_report:
+                self.report(time.perf_counter() - started)
+                next_report += 1
+
+        await asyncio.gather(*tasks)
+
+    def report(self, elapsed: float):
+        depth = self.server.queueDepth() if self.server else "-"
+        size = len(self.registry) if self.registry is not None else "-"
+        dedup = len(self.server.dedup) if self.server else "-"
+        rss = rss_mb() if self.server else 0.0
+        self.samples.append((elapsed, rss, size if self.registry is not None else 0))
+
+        print(
+            f"{elapsed:>6.1f}s sent={self.sent:<8} p50={percentile(self.latencies, 50) * 1000:>6.1f}ms "
+            f"p99={percentile(self.latencies, 99) * 1000:>7.1f}ms 503={self.statuses.get(503, 0):<6} "
+            f"err={self.statuses.get('error', 0):<6} queue={depth:<6} booker={size:<6} dedup={dedup:<6} rss={rss:.1f}MB"
+        )
+        self.latencies = []
+
+async def run(args) -> int:
+    url = args.url
+    registry = server = None
+
+    if not url:
+        port = free_port()
+        os.environ.update({
+            "WEBHOOK_PORT": str(port),
+            "WEBHOOK_BEARER": args.bearer,
+            "LOG_LEVEL": args.log_level,
+            "LOG_FILE": os.path.join(tempfile.gettempdir(), "bookable-loadgen.log")
+        })
+
+        import webhook
+        from details import BookingRegistry
+
+        registry = BookingRegistry()
+
+        async def deliver(userid, msg, details):
+            if args.discord_latency:
+                await asyncio.sleep(args.discord_latency)
+
+        async def empty(userid, bookingid):
+            entry = registry.remove(bookingid)
+            if entry:
+                entry.setStatus("ended")
+            if args.discord_latency:
+                await asyncio.sleep(args.discord_latency)
+
+        server = webhook.WebhookServer(FakeBot())
+        server.set_globals(registry, deliver, empty)
+        await server.webserver()
+        url = f"http://127.0.0.1:{port}/webhook"
+
+    generator = LoadGenerator(args, url, registry, server)
+    generator.session = ClientSession(connector=TCPConnector(limit=args.concurrency))
+    baseline_rss = rss_mb()
+    started = time.perf_counter()
+
+    try:
+        if args.burst:
+            await generator.burst(args.burst)
+        else:
+            await generator.sustained(args.rate, args.duration)
+
+        # let the workers drain before judging the registry size
+        if server:
+            deadline = time.perf_counter() + 30
+            while server.queueDepth() and time.perf_counter() < deadline:
+                await asyncio.sleep(0.1)
+            await asyncio.sleep(0.2)
+    finally:
+        await generator.session.close()
+
+    elapsed = time.perf_counter() - started
+    generator.report(elapsed)
+
+    print("---")
+    print(f"events sent:      {generator.sent} in {elapsed:.1f}s ({generator.sent / elapsed:.0f}/s)")
+    print(f"accept latency:   p50={percentile(generator.all_latencies, 50) * 1000:.1f}ms "
+          f"p99={percentile(generator.all_latencies, 99) * 1000:.1f}ms max={max(generator.all_latencies, default=0) * 1000:.1f}ms")
+    print(f"responses:        {dict(sorted(generator.statuses.items(), key=str))} ({generator.retried} retried)")
+
+    failed = False
+    if server:
+        print(f"server stats:     {server.stats}")
+        print(f"rss:              {baseline_rss:.1f}MB -> {rss_mb():.1f}MB")
+
+        if len(registry) > args.max_booker:
+            print(f"FAIL: booker still holds {len(registry)} booking(s) after every empty webhook was sent (or given up on)")
+            failed = True
+
+        # compare the second half of the run against its midpoint to skip warm-up allocations
+        if len(generator.samples) >= 4:
+            mid_rss = generator.samples[len(generator.samples) // 2][1]
+            growth = generator.samples[-1][1] - mid_rss
+            if growth > args.max_rss_growth:
+                print(f"FAIL: RSS grew {growth:.1f}MB over the second half of the run (limit {args.max_rss_growth}MB)")
+                failed = True
+
+        server.cog_unload()
+
+    print("FAIL" if failed else "PASS")
+    return 1 if failed else 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Webhook load generator and soak test")
+    parser.add_argument("--url", default="", help="external /webhook URL, runs an in-process server if omitted")
+    parser.add_argument("--bearer", default="loadgen", help="WEBHOOK_BEARER to sign requests with")
+    parser.add_argument("--rate", type=float, default=200, help="events per second, 0 for as fast as possible")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of sustained load")
+    parser.add_argument("--burst", type=int, default=0, help="send this many bookings at once instead of a stream")
+    parser.add_argument("--concurrency", type=int, default=100, help="max requests in flight")
+    parser.add_argument("--retries", type=int, default=3, help="retries of a 503 after its Retry-After")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1)
+    parser.add_argument("--reorder-rate", type=float, default=0.05, help="bookings whose empty arrives before started")
+    parser.add_argument("--unknown-rate", type=float, default=0.05, help="extra events for unknown booking IDs")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="seconds per simulated Discord call")
+    parser.add_argument("--max-booker", type=int, default=0, help="bookings allowed to remain tracked at the end")
+    parser.add_argument("--max-rss-growth", type=float, default=20.0, help="MB the RSS may grow over the second half")
+    parser.add_argument("--log-level", default="ERROR")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(run(parse_args())))
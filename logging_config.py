@@ -1,17 +1,60 @@
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import copy
+import json
+import queue
+import atexit
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower() # text or json
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log collectors."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    """Keeps the traceback apart from the message, so the formatters on the listener thread can place it."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_traceback_formatter = logging.Formatter()
 
 
 def setup_logger(name: str = "discord_bookable") -> logging.Logger:
     """Configure and return a logger instance.
 
-    Creates a rotating file handler and a console handler. Log format includes
-    timestamp, level, module, and message. Subsequent calls return the same
-    logger without adding duplicate handlers.
+    Records are put on a queue and written by a background thread, which owns
+    the console handler and the rotating file handler, so a slow disk never
+    blocks the event loop. Log format includes timestamp, level, module, and
+    message, or one JSON object per line with LOG_FORMAT=json. Subsequent calls
+    return the same logger without adding duplicate handlers.
     """
     logger = logging.getLogger(name)
     if logger.handlers:  # Already configured
@@ -20,26 +63,42 @@ def setup_logger(name: str = "discord_bookable") -> logging.Logger:
     level = getattr(logging, LOG_LEVEL, logging.INFO)
     logger.setLevel(level)
 
-    log_format = logging.Formatter(
-        fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(module)s:%(lineno)d | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    if LOG_FORMAT == "json":
+        log_format = JSONFormatter()
+    else:
+        log_format = logging.Formatter(
+            fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(module)s:%(lineno)d | %(message)s",
+            datefmt="%Y-%m-%d %H:%M:%S"
+        )
+
+    handlers = []
 
     # Console handler
     ch = logging.StreamHandler()
     ch.setLevel(level)
     ch.setFormatter(log_format)
-    logger.addHandler(ch)
+    handlers.append(ch)
 
     # Rotating file handler (5 MB * 3 backups)
+    file_error = None
     try:
         fh = RotatingFileHandler(LOG_FILE, maxBytes=5 * 1024 * 1024, backupCount=3)
         fh.setLevel(level)
         fh.setFormatter(log_format)
-        logger.addHandler(fh)
-    except OSError:
+        handlers.append(fh)
+    except OSError as e:
+        file_error = e
+
+    # Writes happen on the listener thread, stopped (and flushed) at exit
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(_QueueHandler(log_queue))
+
+    if file_error is not None:
         # If file can't be created (permissions, read-only FS), continue with console only
         logger.warning("Failed to create log file '%s'. Proceeding with console logging only.", LOG_FILE)
 
-    logger.debug("Logger initialized (level=%s, file=%s)", LOG_LEVEL, LOG_FILE)
+    logger.debug("Logger initialized (level=%s, file=%s, format=%s)", LOG_LEVEL, LOG_FILE, LOG_FORMAT)
     return logger
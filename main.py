@@ -7,46 +7,131 @@ from datetime import datetime
 from dotenv import load_dotenv
 import os
 import asyncio
+import aiohttp
+from typing import Optional
 
 import api
-from details import booking
+import memory
+import metrics
+from details import booking, BookingRegistry
+from store import CreateBookingStore
+from reconcile import Reconciler
+from sweeper import TimeoutSweeper
+from providers import LoadProviders, LoadRegionGroups, LoadRegionSnapshot, SaveRegionSnapshot, AUTO_REGION
+from commandsync import SyncCommandTree
+from regionindex import RegionIndex, MAX_SUGGESTIONS
+from statusboard import StatusBoard, STATUS_BOARD
+from state import CreateStateBackend, BookingLeases
+from dispatcher import BookingDispatcher
+from outbound import OutboundScheduler, PRIORITY_DM, PRIORITY_COSMETIC
 from logging_config import setup_logger
 from logging import Logger
 
 load_dotenv()
 logger: Logger = setup_logger()
 
-intents = discord.Intents.all()
-client = commands.Bot(command_prefix='/', intents=intents)
-
-PROVIDER = os.getenv("PROVIDER")
-PROVIDER_NAME = os.getenv("PROVIDER_NAME")
+# Slash commands and DMs don't need any privileged intent, nor member or message caches
+intents = discord.Intents.none()
+intents.guilds = True
+client = commands.Bot(
+    command_prefix='/',
+    intents=intents,
+    member_cache_flags=discord.MemberCacheFlags.none(),
+    max_messages=None,
+    chunk_guilds_at_startup=False
+)
+
+PROVIDERS = LoadProviders() # provider code -> Provider, each with its own MAX_BOOKABLE
+REGION_GROUPS = LoadRegionGroups() # group name -> region codes, booked with /book <group>
+DEFAULT_PROVIDER = next(iter(PROVIDERS))
 GUILD = discord.Object(int(os.getenv("GUILD")))
 CHANNEL = int(os.getenv("CHANNEL_ID"))
-MAX_BOOKABLE = int(os.getenv("MAX_BOOKABLE"))
+REPLICA_URL = os.getenv("REPLICA_URL") or os.getenv("WEBHOOK_URL") # where other replicas hand our webhooks to
+BOOKING_TIMEOUT = 600 # 10 minutes is more than sufficient
+REGION_RETRY_DELAY = 5      # seconds before fetching the region catalogue again, doubled up to REGION_RETRY_MAX
+REGION_RETRY_MAX = 60
+REGION_FAILOVER_ATTEMPTS = int(os.getenv("REGION_FAILOVER_ATTEMPTS", "3")) # regions of a group tried before giving up
 
 # Global variables
-g_regions = {}
-regions = []
-booker = {}
-BookingAmount = 0
-choices = []
+regions = RegionIndex() # region catalogue of every provider, searched by the region autocomplete
+booker = BookingRegistry()
+state = CreateStateBackend()
+leases = BookingLeases(state, REPLICA_URL)
+booker.leases = leases
+dispatcher = BookingDispatcher()
+outbound = OutboundScheduler()
+board = StatusBoard(client, CHANNEL, PROVIDERS, booker, outbound)
+if STATUS_BOARD:
+    booker.listener = board.notify
+provider_choices = [app_commands.Choice(name=provider.name, value=provider.code) for provider in PROVIDERS.values()]
+
+
+def GroupRegions(provider, group: str) -> Optional[list]:
+    """
+    Returns:
+        Optional[list[str]]: The regions of the provider a group (or "auto") stands for, None if it isn't a group
+    """
+    group = group.strip().lower()
+    if group == AUTO_REGION:
+        return [region["code"] for region in provider.regions]
+    if group in REGION_GROUPS:
+        return [code for code in REGION_GROUPS[group] if provider.servesRegion(code)]
+    return None
+
+def RegionName(code: str) -> str:
+    """Full name of a region, its code if the catalogue doesn't have it (yet)"""
+    return regions.name(code) or code
+
+# Fetches the region catalogue until the API answers, the snapshot of the last run is used meanwhile
+async def RefreshRegionCatalogue():
+    delay = REGION_RETRY_DELAY
+    while True:
+        fetched = await asyncio.gather(*(api.FetchBookableRegions(provider.code) for provider in PROVIDERS.values()))
+        if any(fetched):
+            break
 
+        logger.warning("Unable to fetch the region catalogue, retrying in %ds", delay)
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, REGION_RETRY_MAX)
 
-# For choices init
-async def GetBookableChoices():
-    global choices
-    for region in regions:
-        choices.append(app_commands.Choice(name=region["name"], value=region["code"]))
+    for provider, catalogue in zip(PROVIDERS.values(), fetched):
+        provider.regions = catalogue
 
-        # save into g_regions variable
-        g_regions[region["code"]] = {
-            "fullname": region["name"]
-        }
+    await asyncio.to_thread(SaveRegionSnapshot, PROVIDERS)
+    changed = regions.update(PROVIDERS) # only the regions that changed are re-indexed
+    logger.info("Successfully loaded %d regions (%d changed)", len(regions), changed)
 
-        if len(choices) >= 25:  # Discord limit
+#
+#   AUTOCOMPLETE: <region> of /status and /book
+#
+async def RegionAutocomplete(interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+    # Ranked from the cached region list, never waits for the API so it answers well within Discord's 3 seconds
+    provider = getattr(interaction.namespace, "provider", None)
+    if provider not in PROVIDERS:
+        provider = DEFAULT_PROVIDER # what the command falls back to
+
+    available = api.CachedRegionAvailability(provider)
+    suggestions = []
+
+    # Groups first, they are what "just book me something" users are after (only /book can place them)
+    query = current.strip().lower()
+    groups = (AUTO_REGION, *REGION_GROUPS) if interaction.command is not None and interaction.command.name == "book" else ()
+    for group in groups:
+        members = GroupRegions(PROVIDERS[provider], group)
+        if not members or not (group.startswith(query) or (group == AUTO_REGION and "any".startswith(query))):
+            continue
+        free = sum(available.get(code, 0) for code in members)
+        name = "Any region" if group == AUTO_REGION else f"Any region in {group.title()} ({', '.join(code.upper() for code in members)})"
+        suggestions.append(app_commands.Choice(name=f"{name} - {free} available"[:100], value=group))
+        if len(suggestions) >= MAX_SUGGESTIONS:
             break
-    return
+
+    for code in regions.search(current, available, provider, limit=max(0, MAX_SUGGESTIONS - len(suggestions))):
+        name = f"{RegionName(code)} ({code.upper()})"
+        if code in available:
+            name += f" - {available[code]} available"
+        suggestions.append(app_commands.Choice(name=name, value=code))
+    return suggestions
 
 # --------------------------------------------------- DISCORD EVENTS / COMMANDS --------------------------------------------------- #
 
@@ -57,24 +142,33 @@ async def GetBookableChoices():
 async def on_ready():
     logger.info('Logged on as %s', client.user)
 
-    await client.tree.sync(guild=GUILD) # Sync commands
+    # Ready fires again on every reconnect, only upload the commands when they changed
+    try:
+        await SyncCommandTree(client, client.tree, GUILD)
+    except discord.HTTPException as e:
+        logger.error("Unable to sync the command tree: %s", e)
 
 #
-#   SLASHCOMMAND: /status <region:OPT>
+#   SLASHCOMMAND: /status <region:OPT> <provider:OPT>
 #
 @client.tree.command(name="status", description="List all of the bookable locations.", guild=GUILD)
-@app_commands.choices(region=choices)
-async def status(interaction: discord.Interaction, region: str = None):
+@app_commands.choices(provider=provider_choices)
+@app_commands.autocomplete(region=RegionAutocomplete)
+@metrics.COMMAND_LATENCY.time("status")
+async def status(interaction: discord.Interaction, region: str = None, provider: str = None):
     await interaction.response.defer() # might just remove this and have a placeholder
 
-    bookings = await api.FetchBookableAvailability(PROVIDER)
+    selected = PROVIDERS.get(provider) or PROVIDERS[DEFAULT_PROVIDER]
+    if region:
+        region = regions.resolve(region) or region # typed instead of picked from the suggestions
+    bookings = await api.FetchBookableAvailability(selected.code)
 
     # Setup base embed
     embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x4c7c2c,
-            title       = f"**Status - {PROVIDER_NAME}**",
-            description = f"Total Capacity: `{BookingAmount}/{MAX_BOOKABLE}` booked"
+            title       = f"**Status - {selected.name}**",
+            description = f"Total Capacity: `{booker.countByProvider(selected.code)}/{selected.maxBookable}` booked"
         )
     embed.set_footer(text="Regards")
 
@@ -108,6 +202,15 @@ async def status(interaction: discord.Interaction, region: str = None):
                     value=f"`{available}`/`{total}` `available`",
                     inline=True
                 )
+
+        # Let users know when parts of the backend are failing fast
+        breakers = api.GetBreakerStates()
+        if breakers:
+            embed.add_field(
+                name="Service Degraded",
+                value="\n".join(f"`{endpoint}`: {state} (retry in {retry_in:.0f}s)" for endpoint, (state, retry_in) in breakers.items()),
+                inline=False
+            )
         
         await interaction.followup.send(content=f"<@{interaction.user.id}>", embed=embed)
         
@@ -122,14 +225,19 @@ async def status(interaction: discord.Interaction, region: str = None):
         await interaction.followup.send(content=f"<@{interaction.user.id}>", embed=error_embed)
 
 #
-#   SLASHCOMMAND: /book <region>
+#   SLASHCOMMAND: /book <region> <provider:OPT>
 #
 @client.tree.command(name="book", description="Book a server in a location", guild=GUILD)
-@app_commands.choices(region=choices)
-async def book(interaction: discord.Interaction, region: str):
+@app_commands.choices(provider=provider_choices)
+@app_commands.autocomplete(region=RegionAutocomplete)
+@metrics.COMMAND_LATENCY.time("book")
+async def book(interaction: discord.Interaction, region: str, provider: str = None):
     await interaction.response.defer()
 
     user = interaction.user
+    selected = PROVIDERS.get(provider) or PROVIDERS[DEFAULT_PROVIDER]
+    region = regions.resolve(region) or region # typed instead of picked from the suggestions
+    candidates = None if region in regions else GroupRegions(selected, region) # None unless a group was picked
 
     # ACK
     embed = Embed(
@@ -142,13 +250,7 @@ async def book(interaction: discord.Interaction, region: str):
     embed.set_footer(text="Regards")
     msg = await interaction.followup.send(content=f"<@{interaction.user.id}>", embed=embed, wait=True)
 
-    tempID = user.id # using discord snowflake as temp, unique and literally impossible to reach
-
-    global booker, BookingAmount
-    if not isinstance(booker, dict):
-        booker = {}
-
-    if tempID in booker: # If the tempID exists: the request is still being processed
+    if not booker.reserveUser(user.id): # the request is still being processed
         embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x7c2c4c,
@@ -156,24 +258,34 @@ async def book(interaction: discord.Interaction, region: str):
             description = "You have a request being processed.\nPlease wait till it has finished."
         )
         embed.set_footer(text="Regards")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
         return
 
-    booker[tempID] = booking(None, None, None, None)  # Temporary booking object
+    served = bool(candidates) if candidates is not None else selected.servesRegion(region)
+    if not served:
+        embed = Embed(
+            timestamp   = datetime.now(),
+            color       = 0x7c2c4c,
+            title       = "**Bookings**",
+            description = f"This region is not available on {selected.name}.\nPlease pick another region or provider."
+                          if selected.regions else "The region list is still loading.\nPlease try again shortly."
+        )
+        embed.set_footer(text="Apologies")
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+        booker.releaseUser(user.id)
+        return
 
-    bookingid = None
-    for b_id, b_obj in booker.items():
-        if b_obj.getDiscordID() == user.id:
-            embed = Embed(
-                timestamp   = datetime.now(),
-                color       = 0x7c2c4c,
-                title       = "**Bookings**",
-                description = "You have already booked a server.\nPlease unbook the server before booking a new one."
-            )
-            embed.set_footer(text="Regards")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
-            del booker[tempID]
-            return
+    if booker.getByUser(user.id):
+        embed = Embed(
+            timestamp   = datetime.now(),
+            color       = 0x7c2c4c,
+            title       = "**Bookings**",
+            description = "You have already booked a server.\nPlease unbook the server before booking a new one."
+        )
+        embed.set_footer(text="Regards")
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+        booker.releaseUser(user.id)
+        return
     try:
         # Send an invalid message to test if the user has DM disabled
         await user.send()
@@ -187,16 +299,16 @@ async def book(interaction: discord.Interaction, region: str):
             )
         
         embed.set_footer(text="Apologies")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
-        del booker[tempID]
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+        booker.releaseUser(user.id)
         return
     
     except discord.HTTPException:
         # Has DM enabled
         pass
 
-    # Check if it exceeds the MAX_BOOKABLE
-    if BookingAmount >= MAX_BOOKABLE:
+    # Check if it exceeds the MAX_BOOKABLE of the provider, bookings still being created count too
+    if booker.countByProvider(selected.code) + selected.capacity.pending() >= selected.maxBookable:
         embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x7c2c4c,
@@ -204,26 +316,131 @@ async def book(interaction: discord.Interaction, region: str):
             description = "The total server capacity has been reached.\nPlease try again later."
         )
         embed.set_footer(text="Apologies")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
-        del booker[tempID]
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+        booker.releaseUser(user.id)
         return
 
-    # Create the request in the background
-    status, data = await api.CreateMatchaBooking(str(user.id), region, PROVIDER) # Attempt to book
+    # Wait for our turn in the booking queue
+    async def queued(position: int):
+        embed = Embed(
+            timestamp   = datetime.now(),
+            color       = 0x2c4c7c,
+            title       = "**Bookings**",
+            description = f"Your request is queued at position **{position}**.\nThis message will be updated as the queue advances."
+        )
+        embed.set_footer(text="Regards")
+        outbound.edit(msg, priority=PRIORITY_COSMETIC, content=f"<@{interaction.user.id}>", embed=embed)
+
+    try:
+        await dispatcher.acquire(on_position=queued)
+    except asyncio.CancelledError:
+        booker.releaseUser(user.id)
+        raise
+
+    status, data = 0, None
+    token = None        # capacity reservation shared with the other replicas
+    description = None  # set when rejected without calling the API
+    try:
+        # Take a slot of the provider's capacity, atomically across every replica
+        try:
+            token = await state.reserve(selected.code, selected.maxBookable)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("State backend unavailable while booking: %s", e)
+            description = "Service temporarily unavailable.\nPlease try again later or contact the admins."
+
+        # Check the region against the cached availability, and hold a slot while booking
+        availability = await api.FetchBookableAvailability(selected.code)
+        snapshot_at = api.RegionSnapshotTime()
+
+        # Nothing is awaited between the checks and the reservation, so they can't be raced
+        if description is not None:
+            pass # the state backend is unreachable
+
+        elif token is None or booker.countByProvider(selected.code) + selected.capacity.pending() >= selected.maxBookable:
+            description = "The total server capacity has been reached.\nPlease try again later."
+
+        elif candidates is None and not selected.capacity.reserve(availability, snapshot_at, region):
+            alternative = selected.capacity.suggest(availability, snapshot_at, exclude=region)
+            if alternative:
+                description = f"This region has no available servers.\nTry **{availability[alternative]['name']}** instead."
+            else:
+                description = "This region has no available servers.\nPlease try again later."
+            metrics.CREATE_BOOKING_STATUS.inc("full")
 
-    del booker[tempID]
+        elif candidates is None:
+            # Create the request in the background
+            try:
+                status, data = await api.CreateMatchaBooking(str(user.id), region, selected.code) # Attempt to book
+            finally:
+                selected.capacity.release(region, created=status == 200)
+            metrics.CREATE_BOOKING_STATUS.inc(metrics.statusLabel(status))
+
+        else:
+            # Place the booking in the region of the group with the most headroom, moving on to the next one when it is full
+            attempts = 0
+            for placement in selected.capacity.rank(availability, snapshot_at, candidates):
+                if attempts >= REGION_FAILOVER_ATTEMPTS:
+                    break
+                if not selected.capacity.reserve(availability, snapshot_at, placement):
+                    continue # taken by a concurrent /book while the previous attempt was in flight
+
+                attempts += 1
+                region = placement
+                try:
+                    status, data = await api.CreateMatchaBooking(str(user.id), region, selected.code)
+                finally:
+                    selected.capacity.release(region, created=status == 200)
+                metrics.CREATE_BOOKING_STATUS.inc(metrics.statusLabel(status))
+
+                if status != 302:
+                    break
+                api.InvalidateRegionCache()
+                logger.info("Region %s is full, failing over to the next region of the group", region)
+
+            if not attempts:
+                description = "No region of this group has available servers.\nPlease try again later."
+                metrics.CREATE_BOOKING_STATUS.inc("full")
+
+    finally:
+        dispatcher.release(dispatched=description is None)
+        booker.releaseUser(user.id)
+        if token is not None and status != 200:
+            leases.cancel(token)
+
+    if description:
+        embed = Embed(
+            timestamp   = datetime.now(),
+            color       = 0x7c2c4c,
+            title       = "**Bookings**",
+            description = description
+        )
+        embed.set_footer(text="Apologies")
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+        return
 
     match status:
         case 200:
-            # Successful
+            # Successful, store the datas before awaiting anything so it counts against MAX_BOOKABLE
+            response_data = data or {}
+            bookingid = response_data.get("booking", {}).get("bookingID")
+
+            entry = booking(user.id, bookingid, region, msg, selected.code)
+            booker.add(entry)
+            # The webhook resolves the booking the moment it starts, otherwise the sweeper gives up at the deadline
+            sweeper.track(entry, entry.created + BOOKING_TIMEOUT)
+            leases.cancel(token) # queued after the booking's lease, which holds the slot from now on
+            # No cache invalidation, the capacity keeps counting the booking until a snapshot includes it
+
             embed = Embed(
                 timestamp   = datetime.now(),
                 color       = 0x2c4c7c,
                 title       = "**Bookings**",
                 description = "Your server is being booked, this may take some time.\nServer details will be sent to you via private message."
+                              if candidates is None else
+                              f"Your server is being booked in **{RegionName(region)}**, this may take some time.\nServer details will be sent to you via private message."
             )
             embed.set_footer(text="Have fun")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+            await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
 
         case 301:
             # Duplicated (Tried booking from 2 different bots with the same Backend)
@@ -234,19 +451,21 @@ async def book(interaction: discord.Interaction, region: str):
                 description = "You have a separate booking currently.\nPlease unbook from the other bookable before attempting."
             )
             embed.set_footer(text="Regards")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+            await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
             return
         
         case 302:
-            # The region is full
+            # The region (or every region of the group tried) is full, the cached availability was stale
+            api.InvalidateRegionCache()
             embed = Embed(
                 timestamp   = datetime.now(),
                 color       = 0x7c2c4c,
                 title       = "**Bookings**",
                 description = "This region has no available servers.\nPlease try again later."
+                              if candidates is None else "No region of this group has available servers.\nPlease try again later."
             )
             embed.set_footer(text="Apologies")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+            await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
             return
         
         case 0:
@@ -258,7 +477,7 @@ async def book(interaction: discord.Interaction, region: str):
                 description = "Service temporarily unavailable.\nThis could be due to a configuration issue or network problem.\nPlease try again later or contact the admins."
             )
             embed.set_footer(text="Apologies")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+            await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
             return
         
         case _:
@@ -270,65 +489,14 @@ async def book(interaction: discord.Interaction, region: str):
                 description = "An Interal Server Errors has occured.\nPlease try again later."
             )
             embed.set_footer(text=f"Status Code: {status}")
-            await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+            await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
             return
 
-    # Store the datas
-    response_data = data.json()
-    bookingid = response_data.get("booking", {}).get("bookingID")
-
-    if not isinstance(booker, dict):
-        booker = {}
-    booker[bookingid] = booking(user.id, bookingid, region, msg)
-    BookingAmount += 1
-
-    #
-    #   DISCORD INTERACTION WEBHOOK TOKEN IS ONLY VALID FOR 15 MINUTES!!!!!
-    #
-
-    # timeout for webhook
-    timeout = False
-    start_time = datetime.now()
-    while True:
-        if booker[bookingid].getStatus() == "started": # webhook went through
-            break
-        elif booker[bookingid].getStatus() == "starting" and timeout:
-            # We should perform one last fetch in case there were issues delivering the webhook
-            details = await api.manualDetailsCheck(bookingid)
-            if details:
-                await sendServerDetails(user.id, booker[bookingid].getMessageObject(), details)
-                break
-            else:
-                logger.warning("BookingID: %s's webhook and manual check were not successful...", bookingid)
-                embed = Embed(
-                    timestamp   = datetime.now(),
-                    color       = 0x7c2c4c,
-                    title       = "**Bookings**",
-                    description = "The request has timed out.\nPlease try booking again later."
-                )
-                embed.set_footer(text=f"Apologies ({region.upper()})")
-                await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
-
-                # Since the webhook never came through, we will need to send the unbook request
-                await api.StopMatchaBooking(bookingid)
-
-                BookingAmount -= 1
-                del booker[bookingid]
-                break
-
-        elif timeout: # future proof heh
-            break
-
-        # Wait 10 seconds before checking
-        await asyncio.sleep(10)
-        
-        if (datetime.now() - start_time).total_seconds() > 600: # 10 minutes is more than sufficient
-            timeout = True
-
 #
 #   SLASHCOMMAND: /unbook
 #
 @client.tree.command(name="unbook", description="Unbook your server", guild=GUILD)
+@metrics.COMMAND_LATENCY.time("unbook")
 async def unbook(interaction: discord.Interaction):
     await interaction.response.defer()
 
@@ -343,17 +511,9 @@ async def unbook(interaction: discord.Interaction):
     embed.set_footer(text="Regards")
     msg = await interaction.followup.send(content=f"<@{interaction.user.id}>", embed=embed, wait=True)
 
-    global booker, BookingAmount
-    if not isinstance(booker, dict):
-        booker = {}
-
-    bookingid = None
-    for b_id, b_obj in booker.items():
-        if b_obj.getDiscordID() == user.id:
-            bookingid = b_id
-            break
+    entry = booker.getByUser(user.id)
 
-    if bookingid is None:
+    if entry is None:
         embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x7c2c4c,
@@ -361,10 +521,12 @@ async def unbook(interaction: discord.Interaction):
             description = "You haven't booked a server yet.\nPlease book a server first."
         )
         embed.set_footer(text="Regards")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
         return
 
-    if booker[bookingid].getStatus() == "unbooking": # an unbook request is being processed
+    bookingid = entry.getBookingID()
+
+    if entry.getStatus() == "unbooking": # an unbook request is being processed
         embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x7c2c4c,
@@ -372,10 +534,10 @@ async def unbook(interaction: discord.Interaction):
             description = "Your server is being closed right now.\nPlease wait for it to finish."
         )
         embed.set_footer(text="Regards")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
         return
     
-    elif booker[bookingid].getStatus() == "starting": # the server is starting
+    elif entry.getStatus() == "starting": # the server is starting
         embed = Embed(
             timestamp   = datetime.now(),
             color       = 0x7c2c4c,
@@ -383,12 +545,13 @@ async def unbook(interaction: discord.Interaction):
             description = "You may close the server after it has started.\nPlease wait for it to finish."
         )
         embed.set_footer(text="Regards")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
         return
 
-    booker[bookingid].setStatus("unbooking")
+    entry.setStatus("unbooking")
 
     status = await api.StopMatchaBooking(bookingid)
+    api.InvalidateRegionCache()
 
     if status == 200 or status == 404: # Sometimes i lose tracking lol
         embed = Embed(
@@ -398,7 +561,7 @@ async def unbook(interaction: discord.Interaction):
             description = "Your server has been closed.\nThank you for using our service."
         )
         embed.set_footer(text="Have a nice day")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
 
     elif status == 409: # Server is being closed by the backend
         embed = Embed(
@@ -408,7 +571,7 @@ async def unbook(interaction: discord.Interaction):
             description = "Your server is being closed.\nPlease wait till it has finished."
         )
         embed.set_footer(text="Regards")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
         return
 
     else:
@@ -420,21 +583,41 @@ async def unbook(interaction: discord.Interaction):
         )
 
         embed.set_footer(text=f"Status Code: {status}")
-        await msg.edit(content=f"<@{interaction.user.id}>", embed=embed)
+        await outbound.edit(msg, content=f"<@{interaction.user.id}>", embed=embed)
+
+    booker.remove(bookingid) # garbage collect
+
+#
+#   SLASHCOMMAND: /sync (administrators)
+#
+@client.tree.command(name="sync", description="Upload the bot's commands to Discord again", guild=GUILD)
+@app_commands.default_permissions(administrator=True)
+@app_commands.checks.has_permissions(administrator=True)
+async def sync(interaction: discord.Interaction):
+    await interaction.response.defer(ephemeral=True)
 
-    if bookingid in booker: # garbage collect
-        del booker[bookingid]
-        BookingAmount -= 1
+    try:
+        await SyncCommandTree(client, client.tree, GUILD, force=True)
+        await interaction.followup.send("Commands synced.", ephemeral=True)
+    except discord.HTTPException as e:
+        logger.error("Forced command sync failed: %s", e)
+        await interaction.followup.send(f"Sync failed: {e}", ephemeral=True)
 
 #
 #   FUNCTION: Manually triggered to deliever the server details
 #
-async def sendServerDetails(userid: int, msg: WebhookMessage, details: dict):
+async def sendServerDetails(userid: int, msg: Optional[WebhookMessage], details: dict) -> bool:
+    """
+    Returns:
+        bool: False if the DM couldn't be sent, the booking was then closed since nobody can join it
+    """
     connectString = f"connect {details["address"]}:{details["port"]}; password \"{details["sv_password"]}\""
     sdrString = f"connect {details["sdr_ipv4"]}:{details["sdr_port"]}; password \"{details["sv_password"]}\""
     stvString = f"connect {details["address"]}:{details["stv_port"]}"
     instanceName = details["instance"]
-    region = f"{g_regions[details["region"]]["fullname"]} ({details["region"].upper()})"
+    region = f"{RegionName(details["region"])} ({details["region"].upper()})"
+    entry = booker.get(details["bookingid"])
+    provider = PROVIDERS.get(entry.getProvider() if entry else None) or PROVIDERS[DEFAULT_PROVIDER]
     # Should probably turn this into an environment variable instead in the future
     reminder = "Please enter the server first to obtain the host status.\nUse `!host` as the host to control the functionalities of the server (Maps, Config etc).\n\nUse `!votemenu` to change configs and maps.\nUse `!sdr` to receive SDR connect string in-game.\nServer will close if there are less than 2 players for 4 minutes."
 
@@ -473,7 +656,7 @@ async def sendServerDetails(userid: int, msg: WebhookMessage, details: dict):
     
     embed_dm.add_field(
             name="Provider",
-            value=f"`{PROVIDER_NAME}`",
+            value=f"`{provider.name}`",
             inline=True
         )
     
@@ -490,11 +673,17 @@ async def sendServerDetails(userid: int, msg: WebhookMessage, details: dict):
         )
     
     
-    user = client.get_user(userid)
-    if user is None:
-        user = await client.fetch_user(userid) # backup
-    
-    await user.send(embed=embed_dm)
+    try:
+        user = client.get_user(userid)
+        if user is None:
+            user = await client.fetch_user(userid) # backup
+
+        await outbound.send(user, priority=PRIORITY_DM, embed=embed_dm)
+    except discord.HTTPException as e:
+        # e.g. DMs turned off since booking, the details are only ever sent privately
+        logger.warning("Unable to DM the details of booking %s to %s: %s", details["bookingid"], userid, e)
+        await CloseUndeliverable(userid, msg, details["bookingid"])
+        return False
 
     # Confirmation embed
     embed = Embed(
@@ -503,19 +692,101 @@ async def sendServerDetails(userid: int, msg: WebhookMessage, details: dict):
                 title       = "**Bookings**",
                 description = "Server details have been sent to you via private message."
             )
-    embed.set_footer(text=f"{g_regions[details["region"]]["fullname"]} ({details["region"].upper()})")
-    await msg.edit(content=f"<@{userid}>", embed=embed)
+    embed.set_footer(text=region)
+    if msg: # bookings restored after a restart no longer have their interaction message
+        try:
+            await outbound.edit(msg, content=f"<@{userid}>", embed=embed)
+        except discord.HTTPException as e:
+            logger.warning("Unable to update the booking message of %s: %s", details["bookingid"], e) # e.g. deleted
+    return True
+
+#
+#   FUNCTION: Closes a booking whose details couldn't be delivered, and tells the user in the channel
+#
+async def CloseUndeliverable(userid: int, msg: Optional[WebhookMessage], bookingid: int):
+    # End it upstream and stop tracking it first, the messages below are only cosmetic
+    await api.StopMatchaBooking(bookingid)
+    api.InvalidateRegionCache()
+    entry = booker.remove(bookingid)
+    if entry:
+        entry.setStatus("ended")
+
+    embed = Embed(
+        timestamp   = datetime.now(),
+        color       = 0x7c2c4c,
+        title       = "**Bookings**",
+        description = "Your server details could not be sent via private message, so the server was closed.\nPlease enable Direct Messages and book again."
+    )
+    embed.set_footer(text="Apologies")
+    try:
+        if msg:
+            await outbound.edit(msg, content=f"<@{userid}>", embed=embed)
+        else:
+            channel = client.get_channel(CHANNEL) or await client.fetch_channel(CHANNEL)
+            await outbound.send(channel, content=f"<@{userid}>", embed=embed)
+    except discord.HTTPException as e:
+        logger.warning("Unable to tell %s that booking %s was closed: %s", userid, bookingid, e)
+
+#
+#   FUNCTION: Called by the sweeper when the webhook didn't start a booking before its deadline
+#
+async def BookingTimedOut(entry: booking):
+    #
+    #   DISCORD INTERACTION WEBHOOK TOKEN IS ONLY VALID FOR 15 MINUTES!!!!!
+    #
+    bookingid = entry.getBookingID()
+    userid = entry.getDiscordID()
+
+    await client.wait_until_ready() # restored bookings can time out before we are logged in
+
+    # We should perform one last fetch in case there were issues delivering the webhook
+    details = await api.manualDetailsCheck(bookingid)
+
+    if not entry.claimDelivery(): # webhook went through (or is being delivered) during the manual check
+        return
+
+    try:
+        if details:
+            if await sendServerDetails(userid, entry.getMessageObject(), details):
+                entry.setStatus("started")
+            return
+
+        logger.warning("BookingID: %s's webhook and manual check were not successful...", bookingid)
+
+        # Since the webhook never came through, we will need to send the unbook request
+        # (before telling the user, a failed edit must not leave the booking behind)
+        await api.StopMatchaBooking(bookingid)
+        api.InvalidateRegionCache()
+
+        if booker.remove(bookingid):
+            entry.setStatus("ended")
+    finally:
+        entry.delivering = False
+
+    embed = Embed(
+        timestamp   = datetime.now(),
+        color       = 0x7c2c4c,
+        title       = "**Bookings**",
+        description = "The request has timed out.\nPlease try booking again later."
+    )
+    embed.set_footer(text=f"Apologies ({entry.getRegion().upper()})")
+    if entry.getMessageObject():
+        try:
+            await outbound.edit(entry.getMessageObject(), content=f"<@{userid}>", embed=embed)
+        except discord.HTTPException as e:
+            logger.warning("Unable to update the booking message of %s: %s", bookingid, e)
 
 #
 #   FUNCTION: Notify the user that the server was empty and unbooked
 #
 async def ServerIsEmpty(userid: int, bookingid: int):
-    if bookingid in booker: # process the data first, prevent duplicated embed
-        del booker[bookingid] # garbage collect
-        global BookingAmount
-        BookingAmount -= 1
+    entry = booker.remove(bookingid) # process the data first, prevent duplicated embed
+    if entry:
+        entry.setStatus("ended") # the sweeper skips it when its deadline comes
 
-    channel = await client.fetch_channel(CHANNEL)
+    channel = client.get_channel(CHANNEL)
+    if channel is None:
+        channel = await client.fetch_channel(CHANNEL)
 
     embed = Embed(
                 timestamp   = datetime.now(),
@@ -524,11 +795,16 @@ async def ServerIsEmpty(userid: int, bookingid: int):
                 description = "The server has been closed due to inactivity.\nThank you for using our service."
             )
     embed.set_footer(text="Have a nice day")
-    await channel.send(content=f"<@{userid}>", embed=embed)
+    await outbound.send(channel, content=f"<@{userid}>", embed=embed)
 
 
 # ------------------------------- STARTER ------------------------------- #
 
+metrics.ACTIVE_BOOKINGS.collector = booker.countByRegionAndStatus
+metrics.BOOKING_QUEUE_DEPTH.collector = lambda: {(): len(dispatcher)}
+metrics.DISCORD_OUTBOUND_DEPTH.collector = lambda: {(): len(outbound)}
+sweeper = TimeoutSweeper(booker, BookingTimedOut)
+
 webhook_cog = None
 
 async def setup_webhook():
@@ -539,36 +815,52 @@ async def setup_webhook():
     
     # Set the global variables in webhook module
     webhook_cog.set_globals(booker, sendServerDetails, ServerIsEmpty)
+    webhook_cog.set_state(state, REPLICA_URL)
 
 async def run_bot():
     """Run the Discord bot"""
     logger.info("Starting Discord bot...")
+    memory.StartTracing()
 
-    try:
-        # Fetch available regions for choices
-        global regions
-        regions = await api.FetchBookableRegions(PROVIDER)
-        
-        if not regions:
-            logger.error("Unable to fetch data from API.")
-            raise SystemExit("API connection failed")
-        
-        await GetBookableChoices()
-        
-        if not choices:
-            logger.error("Unable to create objects for choices.")
-            raise SystemExit("Discord API failure (choice object)")
-            
-        logger.info("Successfully loaded %d regions", len(regions))
-        
-    except Exception as e:
-        logger.error("Error during bot initialisation: %s", e)
-        raise SystemExit(f"Bot initialisation failed: {e}")
+    # Start from the catalogue of the last run, the fresh one is fetched while logging in
+    if LoadRegionSnapshot(PROVIDERS):
+        regions.update(PROVIDERS)
+        logger.info("Loaded %d regions from the snapshot", len(regions))
+    else:
+        logger.warning("No region snapshot, regions will be available once the Matcha API answers")
+
+    # Resume tracking the bookings from before the restart
+    store = CreateBookingStore()
+    restored = booker.attach(store, DEFAULT_PROVIDER)
+    if restored:
+        logger.info("Restored %d booking(s) from the booking store", restored)
+
+    for entry in booker:
+        if entry.getStatus() == "starting":
+            sweeper.track(entry, entry.created + BOOKING_TIMEOUT)
 
     # Setup webhook cog before starting the bot
     async with client:
         await setup_webhook()
-        await client.start(os.getenv("BOT_TOKEN"))
+
+        # Check the restored bookings against the backend without delaying the login
+        reconciler = Reconciler(client, booker, sendServerDetails)
+        client.loop.create_task(reconciler.run())
+        client.loop.create_task(metrics.MonitorEventLoop())
+        client.loop.create_task(sweeper.run())
+        client.loop.create_task(leases.run())
+        client.loop.create_task(RefreshRegionCatalogue())
+        if STATUS_BOARD:
+            client.loop.create_task(board.run())
+
+        try:
+            await client.start(os.getenv("BOT_TOKEN"))
+        finally:
+            await outbound.drain(timeout=5)
+            outbound.close()
+            await api.CloseSession()
+            await state.close()
+            await store.close()
 
 def main():
     try:
@@ -0,0 +1,90 @@
+import os
+import gc
+import tracemalloc
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+MEMORY_TRACE_FRAMES = int(os.getenv("MEMORY_TRACE_FRAMES", "0")) # tracemalloc frames per allocation, 0 disables tracing
+
+_baseline: Optional[tracemalloc.Snapshot] = None
+
+def StartTracing():
+    """
+    Starts tracemalloc if MEMORY_TRACE_FRAMES is set, tracing costs CPU and memory so it is opt-in.
+    """
+    global _baseline
+    if MEMORY_TRACE_FRAMES > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_TRACE_FRAMES)
+        _baseline = tracemalloc.take_snapshot()
+        logger.info("tracemalloc started with %d frame(s)", MEMORY_TRACE_FRAMES)
+
+def _rssMB() -> Optional[float]:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _snapshotFilter(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    ))
+
+def DiscordCacheSizes(bot) -> str:
+    """
+    One line with the sizes of the discord.py caches, must run on the event loop since they are mutated there.
+    """
+    guilds = bot.guilds
+    return (
+        f"discord cache: {len(guilds)} guild(s), {sum(len(guild.members) for guild in guilds)} member(s), "
+        f"{len(bot.users)} user(s), {len(bot.cached_messages)} message(s)"
+    )
+
+def MemoryReport(cache: str = None, limit: int = 15, since_start: bool = False) -> str:
+    """
+    Plain text memory report: RSS, discord.py cache sizes and, when tracing, the top allocation sites.
+    Walking the gc and taking snapshots takes a while on a big heap, so run it with asyncio.to_thread.
+
+    Args:
+        cache (str): DiscordCacheSizes() of the client, taken on the event loop
+        limit (int): Allocation sites listed
+        since_start (bool): List the growth since tracing started instead of the current totals
+    """
+    lines = []
+
+    rss = _rssMB()
+    lines.append(f"rss: {rss:.1f} MB" if rss is not None else "rss: unknown")
+    lines.append(f"gc objects: {len(gc.get_objects())}, gc counts: {gc.get_count()}")
+
+    if cache is not None:
+        lines.append(cache)
+
+    if not tracemalloc.is_tracing():
+        lines.append("tracemalloc: off, set MEMORY_TRACE_FRAMES to list allocation sites")
+        return "\n".join(lines) + "\n"
+
+    current, peak = tracemalloc.get_traced_memory()
+    lines.append(f"tracemalloc: {current / 1024 / 1024:.1f} MB traced, {peak / 1024 / 1024:.1f} MB peak")
+
+    snapshot = _snapshotFilter(tracemalloc.take_snapshot())
+    if since_start and _baseline is not None:
+        lines.append(f"top {limit} growth since tracing started:")
+        stats = snapshot.compare_to(_snapshotFilter(_baseline), "lineno")
+    else:
+        lines.append(f"top {limit} allocation sites:")
+        stats = snapshot.statistics("lineno")
+
+    for stat in stats[:limit]:
+        lines.append(f"  {stat}")
+
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,155 @@
+import time
+import asyncio
+import functools
+from bisect import bisect_left
+from typing import Callable, Optional
+from logging_config import setup_logger
+from logging import Logger
+
+logger: Logger = setup_logger()
+
+#
+#   Minimal Prometheus text exposition, every observation is a couple of integer
+#   increments on preallocated lists so it can stay enabled in production.
+#
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_metrics = []
+
+def _labelString(labels: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labels, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Value:
+    """
+    A single value per label set, either updated directly or filled at scrape time
+    by a collector returning {labelvalues: value}.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), collector: Optional[Callable[[], dict]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collector = collector
+        self._values = {} # labelvalues -> float
+        _metrics.append(self)
+
+    def render(self) -> list:
+        values = self._values
+        if self.collector is not None:
+            try:
+                values = self.collector()
+            except Exception:
+                logger.exception("Error collecting metric %s", self.name)
+                values = {}
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in values.items():
+            lines.append(f"{self.name}{_labelString(self.labels, labelvalues)} {value}")
+        return lines
+
+class Counter(_Value):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+class Gauge(_Value):
+    kind = "gauge"
+
+    def set(self, value: float, *labelvalues):
+        self._values[labelvalues] = value
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {} # labelvalues -> [count per bucket..., +Inf count, sum]
+        _metrics.append(self)
+
+    def observe(self, value: float, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def time(self, *labelvalues):
+        """
+        Decorator recording how long an async function takes.
+        """
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - started, *labelvalues)
+            return wrapper
+        return decorator
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labelString(self.labels, values, le)} {cumulative}")
+
+            cumulative += series[len(self.buckets)]
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labelString(self.labels, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labelString(self.labels, values)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labelString(self.labels, values)} {cumulative}")
+        return lines
+
+def render() -> str:
+    """
+    Returns every metric in the Prometheus text format.
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def statusLabel(status: int) -> str:
+    """
+    Groups server errors together to keep the label set small.
+    """
+    return "5xx" if status >= 500 else str(status)
+
+# ------------------------------- METRICS ------------------------------- #
+
+API_LATENCY = Histogram("bookable_api_request_seconds", "Latency of Matcha API calls", ("call",))
+COMMAND_LATENCY = Histogram("bookable_command_seconds", "Slash command latency from invocation to final response", ("command",))
+WEBHOOK_DELIVERY_LATENCY = Histogram("bookable_webhook_delivery_seconds", "Webhook receipt until the server details were delivered by DM")
+API_BREAKER_STATE = Gauge("bookable_api_breaker_state", "Circuit breaker per Matcha API endpoint (0 closed, 1 half-open, 2 open)", ("endpoint",))
+CREATE_BOOKING_STATUS = Counter("bookable_create_booking_total", "CreateMatchaBooking results by status code, \"full\" when the region was rejected locally", ("status",))
+ACTIVE_BOOKINGS = Gauge("bookable_active_bookings", "Tracked bookings", ("provider", "region", "status"))
+BOOKING_QUEUE_DEPTH = Gauge("bookable_booking_queue_depth", "/book requests waiting in the booking queue")
+DISCORD_OUTBOUND_DEPTH = Gauge("bookable_discord_outbound_depth", "Discord messages and edits waiting to be sent")
+WEBHOOK_QUEUE_DEPTH = Gauge("bookable_webhook_queue_depth", "Webhooks waiting for a worker")
+WEBHOOKS = Counter("bookable_webhooks_total", "Received webhooks by outcome", ("result",))
+EVENT_LOOP_LAG = Gauge("bookable_event_loop_lag_seconds", "Delay of the last event loop lag probe")
+EVENT_LOOP_LAG_HISTOGRAM = Histogram("bookable_event_loop_lag_probe_seconds", "Event loop lag probes", buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+
+async def MonitorEventLoop(interval: float = 0.5):
+    """
+    Measures how late the event loop wakes up a sleeping task.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.set(lag)
+        EVENT_LOOP_LAG_HISTOGRAM.observe(lag)
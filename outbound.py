@@ -0,0 +1,220 @@
+import os
+import time
+import asyncio
+import discord
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+DISCORD_OUTBOUND_WORKERS = int(os.getenv("DISCORD_OUTBOUND_WORKERS", "8"))  # Discord calls in flight
+DISCORD_ROUTE_RATE = float(os.getenv("DISCORD_ROUTE_RATE", "1"))            # calls per second per route
+DISCORD_ROUTE_BURST = int(os.getenv("DISCORD_ROUTE_BURST", "5"))            # calls a route can burst
+DISCORD_GLOBAL_RATE = float(os.getenv("DISCORD_GLOBAL_RATE", "45"))         # calls per second overall, Discord allows 50
+
+# Lower goes first
+PRIORITY_DM = 0         # DMs carrying connect strings
+PRIORITY_RESULT = 1     # final answers and notifications
+PRIORITY_COSMETIC = 2   # progress updates, usually superseded by a later edit
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Returns:
+            float: Seconds until a token is available, 0 if one is available now
+        """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class _Job:
+    __slots__ = ("key", "route", "priority", "seq", "call", "kwargs", "future")
+
+    def __init__(self, key, route, priority, seq, call, kwargs, future):
+        self.key = key
+        self.route = route
+        self.priority = priority
+        self.seq = seq
+        self.call = call
+        self.kwargs = kwargs
+        self.future = future
+
+def _route(target) -> tuple:
+    """
+    Approximates the Discord rate limit bucket a call to the target falls in.
+    """
+    if isinstance(target, discord.WebhookMessage):
+        return ("interaction", target.id)   # followups are limited per interaction token
+    if isinstance(target, discord.Message):
+        return ("channel", target.channel.id)
+    if isinstance(target, (discord.User, discord.Member)):
+        return ("dm", target.id)
+    return ("channel", getattr(target, "id", None))
+
+def _consume(future: asyncio.Future):
+    # failures are logged by the worker, don't warn about futures nobody awaited
+    if not future.cancelled():
+        future.exception()
+
+def _waiter(future: asyncio.Future) -> asyncio.Future:
+    # shielded, so a cancelled caller doesn't cancel a coalesced edit for everybody else
+    waiter = asyncio.shield(future)
+    waiter.add_done_callback(_consume)
+    return waiter
+
+class OutboundScheduler:
+    """
+    Single queue for the messages sent and edited by the bot.
+
+    - A queued edit of a message is replaced by a newer edit of the same message.
+    - DMs with server details go before anything else.
+    - Every route has its own token bucket, so a busy channel doesn't hold back DMs.
+    """
+
+    def __init__(self, workers: int = DISCORD_OUTBOUND_WORKERS):
+        self.workers = workers
+
+        self._pending = {}          # type: dict[tuple, _Job] # key -> queued job
+        self._running = {}          # type: dict[tuple, asyncio.Future] # key -> job being sent right now
+        self._buckets = {}          # type: dict[tuple, TokenBucket]
+        self._global = TokenBucket(DISCORD_GLOBAL_RATE, DISCORD_GLOBAL_RATE)
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._tasks = []
+
+        self.stats = {"queued": 0, "coalesced": 0, "sent": 0, "failed": 0}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def edit(self, msg, priority: int = PRIORITY_RESULT, **kwargs) -> asyncio.Future:
+        """
+        Queues msg.edit(**kwargs), replacing an edit of the same message that hasn't been sent yet.
+
+        Returns:
+            asyncio.Future: Resolved with the edited message once the latest edit went through
+        """
+        return _waiter(self._submit(("edit", msg.id), _route(msg), priority, msg.edit, kwargs))
+
+    def send(self, target, priority: int = PRIORITY_RESULT, **kwargs) -> asyncio.Future:
+        """
+        Queues target.send(**kwargs) for a user or a channel.
+
+        Returns:
+            asyncio.Future: Resolved with the sent message
+        """
+        return _waiter(self._submit(("send", object()), _route(target), priority, target.send, kwargs))
+
+    def _submit(self, key: tuple, route: tuple, priority: int, call, kwargs: dict) -> asyncio.Future:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+        self.stats["queued"] += 1
+        job = self._pending.get(key)
+        if job is not None:
+            # Still queued, only the latest content matters
+            self.stats["coalesced"] += 1
+            job.call = call
+            job.kwargs = kwargs
+            job.priority = min(job.priority, priority)
+            return job.future
+
+        self._seq += 1
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume)
+        self._pending[key] = _Job(key, route, priority, self._seq, call, kwargs, future)
+        self._wake.set()
+        return future
+
+    def _bucket(self, route: tuple, now: float) -> TokenBucket:
+        bucket = self._buckets.get(route)
+        if bucket is None:
+            if len(self._buckets) >= 256:
+                # routes are per message or user, forget the ones that fully recovered
+                self._buckets = {r: b for r, b in self._buckets.items() if not b.full(now)}
+            bucket = self._buckets[route] = TokenBucket(DISCORD_ROUTE_RATE, DISCORD_ROUTE_BURST)
+        return bucket
+
+    def _next(self) -> tuple:
+        """
+        Returns:
+            tuple: (job to send or None, seconds until a token frees up or None)
+        """
+        now = time.monotonic()
+        wait = None
+
+        for job in sorted(self._pending.values(), key=lambda job: (job.priority, job.seq)):
+            if job.key in self._running: # keep edits of a message in order
+                continue
+
+            bucket = self._bucket(job.route, now)
+            delay = max(self._global.delay(now), bucket.delay(now))
+            if delay:
+                wait = delay if wait is None else min(wait, delay)
+                continue
+
+            self._global.take()
+            bucket.take()
+            del self._pending[job.key]
+            return job, None
+
+        return None, wait
+
+    async def _worker(self):
+        while True:
+            self._wake.clear()
+            job, wait = self._next()
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._running[job.key] = job.future
+            try:
+                result = await job.call(**job.kwargs)
+            except Exception as error:
+                self.stats["failed"] += 1
+                logger.warning("Discord %s to %s failed: %s", job.key[0], job.route, error)
+                if not job.future.done():
+                    job.future.set_exception(error)
+            else:
+                self.stats["sent"] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                del self._running[job.key]
+                self._wake.set()
+
+    async def drain(self, timeout: Optional[float] = None):
+        """
+        Waits until everything queued so far has been sent.
+        """
+        futures = [job.future for job in self._pending.values()] + list(self._running.values())
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
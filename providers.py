@@ -0,0 +1,129 @@
+import os
+import json
+import time
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+from capacity import RegionCapacity
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+REGION_SNAPSHOT_PATH = os.getenv("REGION_SNAPSHOT_PATH", "regions.json") # last fetched region catalogue, empty to disable
+AUTO_REGION = "auto" # books whichever served region has the most free servers
+
+class Provider:
+    """
+    A cloud provider served by the bot, with its own capacity and regions.
+    """
+
+    def __init__(self, code: str, name: str, max_bookable: int):
+        self.code = code                    # provider name used by the Matcha API
+        self.name = name                    # display name
+        self.maxBookable = max_bookable
+        self.capacity = RegionCapacity()
+        self.regions = []                   # type: list[dict] # [{code, name}] from api.FetchBookableRegions
+
+    def servesRegion(self, region: str) -> bool:
+        return any(entry["code"] == region for entry in self.regions)
+
+def LoadProviders() -> dict:
+    """
+    Reads the served providers from PROVIDERS ("code:Name:max,code:Name:max"),
+    falling back to the single PROVIDER, PROVIDER_NAME and MAX_BOOKABLE.
+
+    Returns:
+        dict: {provider code: Provider}, in configuration order
+    """
+    providers = {}
+
+    configured = os.getenv("PROVIDERS", "").strip()
+    if not configured:
+        provider = Provider(os.getenv("PROVIDER"), os.getenv("PROVIDER_NAME"), int(os.getenv("MAX_BOOKABLE")))
+        return {provider.code: provider}
+
+    for entry in configured.split(","):
+        parts = [part.strip() for part in entry.split(":")]
+        if len(parts) != 3 or not parts[0]:
+            raise ValueError(f"Invalid PROVIDERS entry '{entry}', expected code:Name:max")
+
+        code, name, max_bookable = parts
+        providers[code] = Provider(code, name or code, int(max_bookable))
+
+    logger.info("Serving %d provider(s): %s", len(providers), ", ".join(providers))
+    return providers
+
+def LoadRegionGroups() -> dict:
+    """
+    Reads the region groups offered to /book from REGION_GROUPS ("asia:sgp,tyo,hkg;europe:fra,ams").
+
+    Returns:
+        dict: {group name (lowercase): [region codes]}, in configuration order
+    """
+    groups = {}
+
+    configured = os.getenv("REGION_GROUPS", "").strip()
+    if not configured:
+        return groups
+
+    for entry in configured.split(";"):
+        name, _, members = entry.partition(":")
+        name = name.strip().lower()
+        codes = [code.strip() for code in members.split(",") if code.strip()]
+        if not name or not codes or name == AUTO_REGION:
+            raise ValueError(f"Invalid REGION_GROUPS entry '{entry}', expected name:region,region")
+
+        groups[name] = codes
+
+    logger.info("Region groups: %s", ", ".join(groups))
+    return groups
+
+def LoadRegionSnapshot(providers: dict) -> bool:
+    """
+    Fills the regions of the providers from the catalogue saved by the last run,
+    so the bot can start before the Matcha API answers.
+
+    Returns:
+        bool: True if any provider got regions from the snapshot
+    """
+    if not REGION_SNAPSHOT_PATH:
+        return False
+
+    try:
+        with open(REGION_SNAPSHOT_PATH) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring unreadable region snapshot '%s': %s", REGION_SNAPSHOT_PATH, e)
+        return False
+
+    loaded = False
+    for code, regions in snapshot.get("providers", {}).items():
+        if code in providers and regions:
+            providers[code].regions = regions
+            loaded = True
+
+    if loaded:
+        logger.info("Loaded the region catalogue saved %.0fs ago", time.time() - snapshot.get("saved", time.time()))
+    return loaded
+
+def SaveRegionSnapshot(providers: dict):
+    """
+    Saves the regions of the providers for the next start, replacing the file atomically.
+    """
+    if not REGION_SNAPSHOT_PATH:
+        return
+
+    snapshot = {
+        "saved": time.time(),
+        "providers": {code: provider.regions for code, provider in providers.items()}
+    }
+    try:
+        temporary = f"{REGION_SNAPSHOT_PATH}.tmp"
+        with open(temporary, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file)
+        os.replace(temporary, REGION_SNAPSHOT_PATH)
+    except OSError as e:
+        logger.warning("Unable to save the region snapshot '%s': %s", REGION_SNAPSHOT_PATH, e)
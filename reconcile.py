@@ -0,0 +1,107 @@
+import os
+import asyncio
+from dotenv import load_dotenv
+from discord.ext import commands
+from logging_config import setup_logger
+from logging import Logger
+
+import api
+from details import BookingRegistry
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+RECONCILE_INTERVAL = float(os.getenv("RECONCILE_INTERVAL", "0"))        # seconds between periodic runs, 0 disables
+RECONCILE_CONCURRENCY = int(os.getenv("RECONCILE_CONCURRENCY", "5"))    # bookings checked in parallel
+
+LIVE_STATUSES = ("starting", "started")
+
+class Reconciler:
+    """
+    Compares the locally tracked bookings with what the Matcha API considers live
+    and corrects the local state where they diverge.
+    """
+
+    def __init__(self, bot: commands.Bot, booker: BookingRegistry, send_server_details_func):
+        self.bot = bot
+        self.booker = booker
+        self.sendServerDetails = send_server_details_func
+
+    async def reconcile(self) -> dict:
+        """
+        Checks every tracked booking against /v1/resources/bookings/{id}.
+
+        Returns:
+            dict: Divergence report with the booking IDs that were ended or started upstream
+                  and the ones that could not be checked
+        """
+        report = {"checked": 0, "ended": [], "started": [], "failed": []}
+        limiter = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+        async def check(entry):
+            async with limiter:
+                status, info = await api.FetchBookingInfo(entry.getBookingID())
+            report["checked"] += 1
+
+            # The booking may have changed while we were waiting on the API
+            if entry.getBookingID() not in self.booker:
+                return
+
+            if status == 404 or (status == 200 and (info is None or info.get("status") not in LIVE_STATUSES)):
+                self.booker.remove(entry.getBookingID())
+                entry.setStatus("ended")
+                report["ended"].append(entry.getBookingID())
+
+            elif status == 200 and info.get("status") == "started" and entry.getStatus() == "starting":
+                # The start webhook never reached us (e.g. it was sent while we were down)
+                await self.bot.wait_until_ready()
+                if not entry.claimDelivery(): # delivered (or being delivered) by the webhook or the sweeper
+                    return
+
+                try:
+                    delivered = await self.sendServerDetails(
+                        entry.getDiscordID(),
+                        entry.getMessageObject(),
+                        api.ParseServerDetails(info, entry.getBookingID(), entry.getRegion())
+                    )
+                    if delivered:
+                        entry.setStatus("started")
+                finally:
+                    entry.delivering = False
+                report["started" if delivered else "ended"].append(entry.getBookingID())
+
+            elif status != 200:
+                report["failed"].append(entry.getBookingID())
+
+        results = await asyncio.gather(*(check(entry) for entry in self.booker), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error("Error reconciling a booking: %s", result, exc_info=result)
+
+        if report["ended"] or report["started"]:
+            api.InvalidateRegionCache()
+            logger.warning(
+                "Reconciliation diverged: %d booking(s) ended upstream %s, %d started upstream %s",
+                len(report["ended"]), report["ended"], len(report["started"]), report["started"]
+            )
+
+        logger.info(
+            "Reconciled %d booking(s) (%d could not be checked)",
+            report["checked"], len(report["failed"])
+        )
+        return report
+
+    async def run(self):
+        """
+        Reconciles once on startup, then every RECONCILE_INTERVAL seconds if configured.
+        """
+        while True:
+            try:
+                await self.reconcile()
+            except Exception:
+                logger.exception("Error during booking reconciliation")
+
+            if RECONCILE_INTERVAL <= 0:
+                return
+
+            await asyncio.sleep(RECONCILE_INTERVAL)
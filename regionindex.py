@@ -0,0 +1,151 @@
+from typing import Optional
+
+MAX_SUGGESTIONS = 25 # Discord's limit on autocomplete results
+PREFIX_LENGTH = 12   # longest prefix indexed, longer queries are filtered from its candidates
+
+class RegionIndex:
+    """
+    In-memory search over the region catalogue for autocomplete.
+
+    Prefixes of every region's code, name and name words map to the region codes,
+    so a keystroke is a dict lookup plus ranking a few candidates.
+    Queries without a prefix match fall back to a subsequence match ("sgp" -> "Singapore").
+    """
+
+    def __init__(self):
+        self._regions = {}  # type: dict[str, tuple[str, frozenset]] # code -> (name, provider codes)
+        self._prefixes = {} # type: dict[str, set[str]]              # prefix -> region codes
+
+    def __len__(self) -> int:
+        return len(self._regions)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self._regions
+
+    def name(self, code: str) -> Optional[str]:
+        entry = self._regions.get(code)
+        return entry[0] if entry else None
+
+    @staticmethod
+    def _keys(code: str, name: str) -> set:
+        keys = set()
+        for word in {code.lower(), name.lower(), *name.lower().split()}:
+            for length in range(1, min(len(word), PREFIX_LENGTH) + 1):
+                keys.add(word[:length])
+        return keys
+
+    def _add(self, code: str, name: str, providers: frozenset):
+        self._regions[code] = (name, providers)
+        for key in self._keys(code, name):
+            self._prefixes.setdefault(key, set()).add(code)
+
+    def _remove(self, code: str):
+        name, _ = self._regions.pop(code)
+        for key in self._keys(code, name):
+            codes = self._prefixes.get(key)
+            if codes is not None:
+                codes.discard(code)
+                if not codes:
+                    del self._prefixes[key]
+
+    def update(self, providers: dict) -> int:
+        """
+        Applies the regions of the providers, only re-indexing the regions that changed.
+
+        Args:
+            providers (dict): {provider code: Provider}
+
+        Returns:
+            int: Regions added, removed or renamed
+        """
+        catalogue = {} # type: dict[str, tuple[str, set]]
+        for provider in providers.values():
+            for region in provider.regions:
+                name, served = catalogue.setdefault(region["code"], (region["name"] or region["code"], set()))
+                served.add(provider.code)
+
+        changed = 0
+        for code in [code for code in self._regions if code not in catalogue]:
+            self._remove(code)
+            changed += 1
+
+        for code, (name, served) in catalogue.items():
+            current = self._regions.get(code)
+            if current is not None and current[0] == name:
+                self._regions[code] = (name, frozenset(served)) # providers aren't indexed
+                continue
+
+            if current is not None:
+                self._remove(code)
+            self._add(code, name, frozenset(served))
+            changed += 1
+
+        return changed
+
+    def resolve(self, text: str) -> Optional[str]:
+        """
+        Maps a typed region (code or full name, any case) to its code, for values not picked from the suggestions.
+        """
+        if text in self._regions:
+            return text
+
+        lowered = text.strip().lower()
+        for code, (name, _) in self._regions.items():
+            if lowered in (code.lower(), name.lower()):
+                return code
+        return None
+
+    @staticmethod
+    def _subsequence(query: str, text: str) -> bool:
+        remaining = iter(text)
+        return all(char in remaining for char in query)
+
+    def _rank(self, code: str, query: str) -> int:
+        name = self._regions[code][0].lower()
+        if code.lower() == query:
+            return 0
+        if code.lower().startswith(query):
+            return 1
+        if name.startswith(query):
+            return 2
+        if any(word.startswith(query) for word in name.split()):
+            return 3
+        return 4 # fuzzy or longer than the indexed prefixes
+
+    def search(self, query: str, available: dict = None, provider: str = None, limit: int = MAX_SUGGESTIONS) -> list:
+        """
+        Args:
+            query (str): What the user typed so far
+            available (dict): {region code: free slots} used to rank equally good matches, from the cached snapshot
+            provider (str): Only suggest regions served by this provider
+
+        Returns:
+            list[str]: Region codes, best match first
+        """
+        query = query.strip().lower()
+        available = available or {}
+
+        if not query:
+            candidates = self._regions.keys()
+        else:
+            candidates = self._prefixes.get(query[:PREFIX_LENGTH], ())
+            if len(query) > PREFIX_LENGTH:
+                candidates = [code for code in candidates if self._rank(code, query) < 4]
+            if not candidates:
+                candidates = [
+                    code for code, (name, _) in self._regions.items()
+                    if self._subsequence(query, code.lower()) or self._subsequence(query, name.lower())
+                ]
+
+        if provider is not None:
+            candidates = [code for code in candidates if provider in self._regions[code][1]]
+
+        ranked = sorted(
+            candidates,
+            key=lambda code: (
+                self._rank(code, query) if query else 0,
+                -available.get(code, 0),
+                self._regions[code][0]
+            )
+        )
+        return ranked[:limit]
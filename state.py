@@ -0,0 +1,252 @@
+import os
+import time
+import uuid
+import asyncio
+import aiohttp
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()        # memory | http
+STATE_BACKEND_URL = os.getenv("STATE_BACKEND_URL", "")              # base URL of the http backend
+STATE_BACKEND_TOKEN = os.getenv("STATE_BACKEND_TOKEN", "")          # bearer sent to the http backend
+STATE_BACKEND_TIMEOUT = float(os.getenv("STATE_BACKEND_TIMEOUT", "3"))
+STATE_LEASE_TTL = float(os.getenv("STATE_LEASE_TTL", "60"))         # seconds a booking lease lives without renewal
+STATE_RESERVATION_TTL = 60                                          # seconds a capacity reservation lives for
+
+class StateBackend:
+    """
+    State shared by every replica of the bot.
+
+    - Capacity: a provider's used capacity is its leased bookings plus its reservations,
+      reserve() atomically takes a slot if that stays under the limit.
+    - Leases: every booking is leased by the replica that made it (its webhook URL),
+      so a webhook hitting another replica can be handed off to the owner.
+
+    Leases and reservations expire unless renewed, so a crashed replica frees its capacity.
+    """
+
+    async def reserve(self, scope: str, limit: int, ttl: float = STATE_RESERVATION_TTL) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: Reservation token, None if the capacity of the scope is used up
+        """
+        raise NotImplementedError
+
+    async def cancel(self, token: str):
+        """
+        Drops a reservation, once its booking failed or got leased.
+        """
+        raise NotImplementedError
+
+    async def lease(self, bookingid: int, owner: str, scope: str, ttl: float = STATE_LEASE_TTL) -> bool:
+        """
+        Takes or renews the lease of a booking.
+
+        Returns:
+            bool: False if the booking is leased by another owner
+        """
+        raise NotImplementedError
+
+    async def release(self, bookingid: int, owner: str):
+        raise NotImplementedError
+
+    async def owner(self, bookingid: int) -> Optional[str]:
+        """
+        Returns:
+            Optional[str]: The owner of the booking's lease, None if it isn't leased
+        """
+        raise NotImplementedError
+
+    async def count(self, scope: str) -> int:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+class MemoryStateBackend(StateBackend):
+    """
+    Keeps the state in this process, for a single replica (and behind the stand-in server).
+    """
+
+    def __init__(self):
+        self._leases = {}       # type: dict[int, tuple[str, str, float]] # bookingID -> (owner, scope, expiry)
+        self._reservations = {} # type: dict[str, tuple[str, float]]      # token -> (scope, expiry)
+
+    def _expire(self):
+        now = time.monotonic()
+        self._leases = {k: v for k, v in self._leases.items() if v[2] > now}
+        self._reservations = {k: v for k, v in self._reservations.items() if v[1] > now}
+
+    def _used(self, scope: str) -> int:
+        return (
+            sum(1 for _, leased, _ in self._leases.values() if leased == scope)
+            + sum(1 for reserved, _ in self._reservations.values() if reserved == scope)
+        )
+
+    async def reserve(self, scope: str, limit: int, ttl: float = STATE_RESERVATION_TTL) -> Optional[str]:
+        self._expire()
+        if self._used(scope) >= limit:
+            return None
+
+        token = uuid.uuid4().hex
+        self._reservations[token] = (scope, time.monotonic() + ttl)
+        return token
+
+    async def cancel(self, token: str):
+        self._reservations.pop(token, None)
+
+    async def lease(self, bookingid: int, owner: str, scope: str, ttl: float = STATE_LEASE_TTL) -> bool:
+        self._expire()
+        current = self._leases.get(bookingid)
+        if current is not None and current[0] != owner:
+            return False
+
+        self._leases[bookingid] = (owner, scope, time.monotonic() + ttl)
+        return True
+
+    async def release(self, bookingid: int, owner: str):
+        current = self._leases.get(bookingid)
+        if current is not None and current[0] == owner:
+            del self._leases[bookingid]
+
+    async def owner(self, bookingid: int) -> Optional[str]:
+        self._expire()
+        current = self._leases.get(bookingid)
+        return current[0] if current else None
+
+    async def count(self, scope: str) -> int:
+        self._expire()
+        return self._used(scope)
+
+class HTTPStateBackend(StateBackend):
+    """
+    Talks to a networked key-value service over HTTP, every replica points at the same one.
+    helper/state_server.py serves the protocol for local runs and tests.
+
+    Raises:
+        aiohttp.ClientError, asyncio.TimeoutError: on every method when the service is unreachable
+    """
+
+    def __init__(self, url: str, token: str = ""):
+        self.url = url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _getSession(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers=self.headers,
+                timeout=aiohttp.ClientTimeout(total=STATE_BACKEND_TIMEOUT)
+            )
+        return self._session
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        async with self._getSession().post(f"{self.url}{path}", json=payload) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def _get(self, path: str) -> dict:
+        async with self._getSession().get(f"{self.url}{path}") as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def reserve(self, scope: str, limit: int, ttl: float = STATE_RESERVATION_TTL) -> Optional[str]:
+        return (await self._post("/reserve", {"scope": scope, "limit": limit, "ttl": ttl}))["token"]
+
+    async def cancel(self, token: str):
+        await self._post("/cancel", {"token": token})
+
+    async def lease(self, bookingid: int, owner: str, scope: str, ttl: float = STATE_LEASE_TTL) -> bool:
+        return (await self._post("/lease", {"bookingid": bookingid, "owner": owner, "scope": scope, "ttl": ttl}))["ok"]
+
+    async def release(self, bookingid: int, owner: str):
+        await self._post("/release", {"bookingid": bookingid, "owner": owner})
+
+    async def owner(self, bookingid: int) -> Optional[str]:
+        return (await self._get(f"/owner/{bookingid}"))["owner"]
+
+    async def count(self, scope: str) -> int:
+        return (await self._get(f"/count/{scope}"))["count"]
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+class BookingLeases:
+    """
+    Leases the bookings tracked by this replica and renews them in the background.
+    Calls are queued and sent to the backend in order by a single task,
+    so a booking's lease is always taken before its reservation is dropped.
+    """
+
+    def __init__(self, backend: StateBackend, owner: str, ttl: float = STATE_LEASE_TTL):
+        """
+        Args:
+            backend (StateBackend): The shared state
+            owner (str): URL webhooks for our bookings should be handed to
+        """
+        self.backend = backend
+        self.owner = owner
+        self.ttl = ttl
+
+        self._owned = {}            # type: dict[int, str] # bookingID -> scope
+        self._queue = asyncio.Queue()
+
+    def track(self, bookingid: int, scope: str):
+        self._owned[bookingid] = scope
+        self._queue.put_nowait(("lease", bookingid, scope))
+
+    def untrack(self, bookingid: int):
+        if self._owned.pop(bookingid, None) is not None:
+            self._queue.put_nowait(("release", bookingid, None))
+
+    def cancel(self, token: str):
+        self._queue.put_nowait(("cancel", token, None))
+
+    async def _apply(self, op: str, key, scope: Optional[str]):
+        if op == "lease":
+            if not await self.backend.lease(key, self.owner, scope, self.ttl):
+                logger.warning("Booking %s is leased by another replica", key)
+        elif op == "release":
+            await self.backend.release(key, self.owner)
+        else:
+            await self.backend.cancel(key)
+
+    async def run(self):
+        renew_every = self.ttl / 3
+        renew_at = time.monotonic() + renew_every
+        while True:
+            try:
+                now = time.monotonic()
+                if now >= renew_at:
+                    renew_at = now + renew_every
+                    for bookingid, scope in list(self._owned.items()):
+                        await self._apply("lease", bookingid, scope)
+                    continue
+
+                try:
+                    op = await asyncio.wait_for(self._queue.get(), renew_at - now)
+                except asyncio.TimeoutError:
+                    continue
+                await self._apply(*op)
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # leases are renewed and reservations expire on their own, nothing is lost for good
+                logger.warning("State backend call failed: %s", e)
+
+def CreateStateBackend() -> StateBackend:
+    """
+    Creates the backend selected by STATE_BACKEND.
+    """
+    if STATE_BACKEND == "http":
+        if not STATE_BACKEND_URL:
+            raise ValueError("STATE_BACKEND=http requires STATE_BACKEND_URL")
+        return HTTPStateBackend(STATE_BACKEND_URL, STATE_BACKEND_TOKEN)
+
+    return MemoryStateBackend()
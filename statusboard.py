@@ -0,0 +1,136 @@
+import os
+import time
+import asyncio
+import discord
+from discord import Embed
+from datetime import datetime
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+import api
+from details import BookingRegistry
+from outbound import OutboundScheduler, PRIORITY_COSMETIC
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+STATUS_BOARD = os.getenv("STATUS_BOARD", "").lower() in ("1", "true", "yes")        # keep a live status message in CHANNEL
+STATUS_BOARD_INTERVAL = float(os.getenv("STATUS_BOARD_INTERVAL", "15"))           # minimum seconds between two edits
+STATUS_BOARD_REFRESH = float(os.getenv("STATUS_BOARD_REFRESH", "300"))            # seconds before redrawing without a local event
+STATUS_BOARD_TITLE = "**Status Board**"
+
+class StatusBoard:
+    """
+    A message in CHANNEL showing the capacity and region availability of every provider.
+
+    It is redrawn when a booking starts, ends or times out (notify() is the registry's listener),
+    at most once every STATUS_BOARD_INTERVAL seconds so a busy night collapses into a few redraws.
+    The message is only edited when one of the rendered fields changed.
+    """
+
+    def __init__(self, client: discord.Client, channel_id: int, providers: dict, booker: BookingRegistry,
+                 outbound: OutboundScheduler, interval: float = STATUS_BOARD_INTERVAL):
+        self.client = client
+        self.channel_id = channel_id
+        self.providers = providers
+        self.booker = booker
+        self.outbound = outbound
+        self.interval = interval
+
+        self.stats = {"renders": 0, "edits": 0}
+        self._message = None                # type: Optional[discord.Message]
+        self._fields = None                 # type: Optional[list[tuple[str, str]]] # as last published
+        self._dirty = asyncio.Event()
+        self._drawn_at = float("-inf")
+
+    def notify(self):
+        self._dirty.set()
+
+    async def _findMessage(self) -> Optional[discord.Message]:
+        # Reuse the board of the previous run rather than posting a new one on every restart
+        channel = self.client.get_channel(self.channel_id) or await self.client.fetch_channel(self.channel_id)
+        async for message in channel.history(limit=50):
+            if message.author.id == self.client.user.id and message.embeds and message.embeds[0].title == STATUS_BOARD_TITLE:
+                return message
+        return None
+
+    async def render(self) -> list:
+        """
+        Returns:
+            list[tuple[str, str]]: (name, value) of every field, one per provider
+        """
+        fields = []
+        previous = dict(self._fields or ())
+        for provider in self.providers.values():
+            name = f"{provider.name} - {self.booker.countByProvider(provider.code)}/{provider.maxBookable} booked"
+            availability = await api.FetchBookableAvailability(provider.code)
+            if not availability:
+                # the API failed, keep showing the last known regions rather than blanking them
+                value = next((v for n, v in previous.items() if n.startswith(f"{provider.name} - ")), "Unavailable")
+            else:
+                lines = [
+                    f"`{region['name']}` `{region['available']}`/`{region['quota']}`"
+                    for region in availability.values() if region["quota"]
+                ]
+                value = "\n".join(lines) or "No regions available"
+                if len(value) > 1024: # Discord limit
+                    value = value[:value.rfind("\n", 0, 1020)] + "\n..."
+            fields.append((name[:256], value))
+        return fields
+
+    async def _publish(self, fields: list):
+        embed = Embed(
+            timestamp   = datetime.now(),
+            color       = 0x4c7c2c,
+            title       = STATUS_BOARD_TITLE,
+            description = "Live availability, use `/book` to book a server."
+        )
+        for name, value in fields:
+            embed.add_field(name=name, value=value, inline=False)
+        embed.set_footer(text="Last updated")
+
+        if self._message is None:
+            self._message = await self._findMessage()
+        if self._message is None:
+            channel = self.client.get_channel(self.channel_id) or await self.client.fetch_channel(self.channel_id)
+            self._message = await self.outbound.send(channel, priority=PRIORITY_COSMETIC, embed=embed)
+        else:
+            await self.outbound.edit(self._message, priority=PRIORITY_COSMETIC, embed=embed)
+        self.stats["edits"] += 1
+
+    async def run(self):
+        await self.client.wait_until_ready()
+        self._dirty.set() # draw on start
+
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), STATUS_BOARD_REFRESH)
+            except asyncio.TimeoutError:
+                pass # bookings made through other bots change the availability too
+
+            # Events arriving while we wait are folded into this redraw
+            wait = self._drawn_at + self.interval - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._dirty.clear()
+            self._drawn_at = time.monotonic()
+
+            try:
+                fields = await self.render()
+                self.stats["renders"] += 1
+                if fields == self._fields:
+                    continue
+
+                await self._publish(fields)
+                self._fields = fields
+
+            except discord.NotFound:
+                logger.warning("Status board message was deleted, posting a new one")
+                self._message = None
+                self._dirty.set()
+            except discord.HTTPException as e:
+                logger.warning("Unable to update the status board: %s", e)
+            except Exception:
+                logger.exception("Unexpected error while updating the status board")
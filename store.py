@@ -0,0 +1,149 @@
+import os
+import time
+import asyncio
+import sqlite3
+from typing import Optional
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+BOOKING_STORE = os.getenv("BOOKING_STORE", "sqlite").lower()               # sqlite | memory
+BOOKING_STORE_PATH = os.getenv("BOOKING_STORE_PATH", "bookings.db")
+BOOKING_STORE_FLUSH_INTERVAL = float(os.getenv("BOOKING_STORE_FLUSH_INTERVAL", "0.5")) # seconds to batch writes for
+
+class BookingStore:
+    """
+    Persistence backend for the booking registry.
+    This base implementation keeps nothing, bookings only live in memory.
+    """
+
+    def load(self) -> list:
+        """
+        Returns:
+            list: Every persisted booking as a dict (bookingid, discordid, region, status, channelid, messageid, created)
+        """
+        return []
+
+    def save(self, row: dict):
+        """
+        Queues a booking to be written.
+        """
+        pass
+
+    def delete(self, bookingid: int):
+        """
+        Queues a booking to be removed.
+        """
+        pass
+
+    async def close(self):
+        pass
+
+class MemoryBookingStore(BookingStore):
+    pass
+
+class SQLiteBookingStore(BookingStore):
+    """
+    Stores bookings in a local SQLite database (WAL mode).
+    Writes are coalesced per booking and committed in batches from a worker thread,
+    so recording a status change never blocks the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bookings ("
+            "bookingid INTEGER PRIMARY KEY, "
+            "discordid INTEGER NOT NULL, "
+            "region TEXT, "
+            "provider TEXT, "
+            "status TEXT NOT NULL, "
+            "channelid INTEGER, "
+            "messageid INTEGER, "
+            "created REAL, "
+            "updated REAL)"
+        )
+
+        # Databases from before multi-provider mode don't have the provider column
+        columns = {c[1] for c in self._conn.execute("PRAGMA table_info(bookings)")}
+        if "provider" not in columns:
+            self._conn.execute("ALTER TABLE bookings ADD COLUMN provider TEXT")
+        self._conn.commit()
+
+        self._pending = {}      # type: dict[int, Optional[dict]] # None means delete
+        self._flusher = None    # type: Optional[asyncio.Task]
+
+    def load(self) -> list:
+        cursor = self._conn.execute(
+            "SELECT bookingid, discordid, region, provider, status, channelid, messageid, created FROM bookings"
+        )
+        columns = [c[0] for c in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def save(self, row: dict):
+        self._pending[row["bookingid"]] = row
+        self._schedule()
+
+    def delete(self, bookingid: int):
+        self._pending[bookingid] = None
+        self._schedule()
+
+    def _schedule(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flushLater())
+
+    async def _flushLater(self):
+        await asyncio.sleep(BOOKING_STORE_FLUSH_INTERVAL)
+        await self.flush()
+
+    async def flush(self):
+        """
+        Commits every queued write in a single transaction.
+        """
+        while self._pending:
+            batch, self._pending = self._pending, {}
+            try:
+                await asyncio.to_thread(self._write, batch)
+            except sqlite3.Error:
+                logger.exception("Failed to persist %d booking change(s)", len(batch))
+
+    def _write(self, batch: dict):
+        now = time.time()
+        with self._conn:
+            for bookingid, row in batch.items():
+                if row is None:
+                    self._conn.execute("DELETE FROM bookings WHERE bookingid = ?", (bookingid,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO bookings "
+                        "(bookingid, discordid, region, provider, status, channelid, messageid, created, updated) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (
+                            bookingid, row["discordid"], row["region"], row["provider"], row["status"],
+                            row["channelid"], row["messageid"], row["created"], now
+                        )
+                    )
+
+    async def close(self):
+        if self._flusher is not None:
+            await self._flusher
+        await self.flush()
+        self._conn.close()
+
+def CreateBookingStore() -> BookingStore:
+    """
+    Creates the store selected by BOOKING_STORE, falling back to memory if SQLite is unusable.
+    """
+    if BOOKING_STORE == "sqlite":
+        try:
+            return SQLiteBookingStore(BOOKING_STORE_PATH)
+        except sqlite3.Error:
+            logger.exception("Unable to open booking store '%s', bookings will not persist", BOOKING_STORE_PATH)
+
+    return MemoryBookingStore()
@@ -0,0 +1,102 @@
+import os
+import time
+import heapq
+import asyncio
+from dotenv import load_dotenv
+from logging_config import setup_logger
+from logging import Logger
+
+from details import booking, BookingRegistry
+
+load_dotenv()
+logger: Logger = setup_logger()
+
+SWEEPER_CONCURRENCY = int(os.getenv("SWEEPER_CONCURRENCY", "5")) # overdue bookings handled in parallel
+SWEEPER_RETRY_DELAY = 30        # seconds before handling a booking again after its handler failed, doubled every time
+SWEEPER_RETRY_DELAY_MAX = 600
+
+class TimeoutSweeper:
+    """
+    Tracks the deadline of every starting booking in a min-heap and only wakes up
+    at the next deadline, handing every overdue booking to the timeout handler at once.
+    Bookings that started (or ended) in the meantime are skipped when their deadline comes.
+    """
+
+    def __init__(self, booker: BookingRegistry, timeout_handler):
+        """
+        Args:
+            booker (BookingRegistry): The tracked bookings
+            timeout_handler: async function receiving an overdue booking
+        """
+        self.booker = booker
+        self.timeoutHandler = timeout_handler
+
+        self._deadlines = []        # type: list[tuple[float, int]] # (deadline, bookingID)
+        self._wake = asyncio.Event()
+        self._limiter = asyncio.Semaphore(SWEEPER_CONCURRENCY)
+        self._tasks = set()
+        self._retries = {}          # type: dict[int, int] # bookingID -> failed timeout handlings
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def track(self, entry: booking, deadline: float):
+        """
+        Args:
+            entry (booking): A booking in the "starting" state
+            deadline (float): time.time() at which the booking times out
+        """
+        heapq.heappush(self._deadlines, (deadline, entry.getBookingID()))
+
+        # Only wake up the sweeper if its next deadline changed
+        if self._deadlines[0][1] == entry.getBookingID():
+            self._wake.set()
+
+    def _overdue(self) -> list:
+        now = time.time()
+        overdue = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, bookingid = heapq.heappop(self._deadlines)
+            entry = self.booker.get(bookingid)
+            if entry is not None and entry.getStatus() == "starting":
+                overdue.append(entry)
+        return overdue
+
+    async def _handle(self, entry: booking):
+        async with self._limiter:
+            if entry.getStatus() != "starting": # settled while waiting for a slot
+                return
+            try:
+                await self.timeoutHandler(entry)
+            except Exception:
+                logger.exception("Error handling the timeout of booking %s", entry.getBookingID())
+
+            # Never drop a booking that is still starting, it would hold its slot forever
+            bookingid = entry.getBookingID()
+            if entry.getStatus() == "starting" and bookingid in self.booker:
+                attempt = self._retries.get(bookingid, 0)
+                self._retries[bookingid] = attempt + 1
+                delay = min(SWEEPER_RETRY_DELAY * 2 ** attempt, SWEEPER_RETRY_DELAY_MAX)
+                logger.warning("Booking %s is still starting, handling its timeout again in %ds", bookingid, delay)
+                self.track(entry, time.time() + delay)
+            else:
+                self._retries.pop(bookingid, None)
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+
+            overdue = self._overdue()
+            if overdue:
+                logger.info("%d booking(s) timed out, checking them in the background", len(overdue))
+                for entry in overdue:
+                    task = asyncio.create_task(self._handle(entry))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+
+            # Sleep until the next deadline, or until an earlier one is tracked
+            timeout = self._deadlines[0][0] - time.time() if self._deadlines else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
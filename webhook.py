@@ -1,17 +1,72 @@
-from aiohttp import web
+from aiohttp import web, ClientSession, ClientTimeout, ClientError
 import json
+import time
 import asyncio
+from collections import OrderedDict
 from discord.ext import commands
-from datetime import datetime
 import os
 from dotenv import load_dotenv
 from logging_config import setup_logger
-from logging import Logger
+from logging import Logger, DEBUG
+
+import api
+import memory
+import metrics
+from details import BookingRegistry
+from state import StateBackend
 
 load_dotenv()
 logger: Logger = setup_logger()
 
 WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))            # background workers processing webhooks
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))   # pending webhooks before answering 503
+WEBHOOK_RETRY_AFTER = 5                                              # seconds, sent with 503 responses
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", "4096"))   # remembered deliveries
+WEBHOOK_DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", "600"))    # seconds a delivery is remembered for
+WEBHOOK_FORWARD_TIMEOUT = 5                                          # seconds, handing a webhook to another replica
+FORWARDED_HEADER = "X-Bookable-Forwarded"                            # set on webhooks handed off by another replica
+
+class DedupCache:
+    """
+    Remembers recently seen webhook deliveries, bounded in size and age (TTL).
+    Entries are kept in insertion order, so the oldest one is always evicted first.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._seen = OrderedDict() # key -> expiry (time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, key: tuple) -> bool:
+        """
+        Records a delivery.
+
+        Returns:
+            bool: True if the same delivery was already recorded and hasn't expired
+        """
+        now = time.monotonic()
+
+        # Expired entries are at the front since every insert goes to the back
+        while self._seen:
+            oldest, expiry = next(iter(self._seen.items()))
+            if expiry > now:
+                break
+            del self._seen[oldest]
+
+        if key in self._seen:
+            return True
+
+        self._seen[key] = now + self.ttl
+        if len(self._seen) > self.maxsize:
+            self._seen.popitem(last=False)
+        return False
+
+    def forget(self, key: tuple):
+        self._seen.pop(key, None)
 
 #
 #   CREDITS: https://gist.github.com/crrapi/c8465f9ce8b579a8ca3e78845309b832?permalink_comment_id=3431065#gistcomment-3431065
@@ -23,23 +78,50 @@ class WebhookServer(commands.Cog):
         self.bot = bot
         self.site = None
 
-        self.booker = None
+        self.booker = None # type: BookingRegistry
         self.sendServerDetails = None
         self.ServerIsEmpty = None
+
+        self.state = None # type: StateBackend
+        self.replica = None # URL of this replica, as stored in the booking leases
+        self._session = None
+
+        # One queue per worker, a booking always lands on the same worker so its events stay in order
+        self.queues = [asyncio.Queue(maxsize=max(1, WEBHOOK_QUEUE_SIZE // WEBHOOK_WORKERS)) for _ in range(WEBHOOK_WORKERS)]
+        self.workers = []
+        self.dedup = DedupCache(WEBHOOK_DEDUP_SIZE, WEBHOOK_DEDUP_TTL)
+        self.stats = {
+            "received": 0,
+            "duplicates": 0,
+            "processed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "forwarded": 0,
+            "max_depth": 0
+        }
+        metrics.WEBHOOK_QUEUE_DEPTH.collector = lambda: {(): self.queueDepth()}
+        metrics.WEBHOOKS.collector = lambda: {
+            (result,): self.stats[result] for result in ("received", "duplicates", "processed", "failed", "rejected", "forwarded")
+        }
     
-    def set_globals(self, booker_dict, send_server_details_func, server_is_empty_func):
+    def set_globals(self, booking_registry, send_server_details_func, server_is_empty_func):
         """Set global variables from main.py to avoid circular imports"""
-        self.booker = booker_dict
+        self.booker = booking_registry
         self.sendServerDetails = send_server_details_func
         self.ServerIsEmpty = server_is_empty_func
 
+    def set_state(self, state: StateBackend, replica: str):
+        """Hand webhooks of bookings leased by other replicas over to them"""
+        self.state = state
+        self.replica = replica
+
     async def webhook_handler(self, request):
         """Handle incoming POST requests to the webhook endpoint"""
         try:
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            logger.info("Webhook POST received at %s", timestamp)
-            logger.debug("Webhook headers: %s", dict(request.headers))
+            # Payloads are only formatted when DEBUG is on, this runs for every delivery
+            debug = logger.isEnabledFor(DEBUG)
+            if debug:
+                logger.debug("Webhook POST received, headers: %s", dict(request.headers))
             
             # Validate bearer token if configured
             expected_bearer = os.getenv("WEBHOOK_BEARER")
@@ -56,10 +138,43 @@ class WebhookServer(commands.Cog):
             
             # Webhook will receives JSON
             data = await request.json()
-            logger.debug("Webhook JSON: %s", json.dumps(data, indent=2))
+            if debug:
+                logger.debug("Webhook JSON: %s", json.dumps(data, indent=2))
 
-            await self.checkout_bookable(data)
-            
+            try:
+                bookingid = int(data.get("bookingID"))
+            except (TypeError, ValueError):
+                logger.warning("Webhook request without a valid bookingID")
+                return web.json_response({"error": "Invalid bookingID"}, status=400)
+
+            # Bookings made by another replica are handed over to it
+            if bookingid not in self.booker and self.state is not None and FORWARDED_HEADER not in request.headers:
+                response = await self.handOff(bookingid, data)
+                if response is not None:
+                    return response
+
+            # Retried deliveries are acknowledged without touching Discord again
+            self.stats["received"] += 1
+            key = self.dedupKey(bookingid, data)
+            if self.dedup.seen(key):
+                self.stats["duplicates"] += 1
+                logger.debug("Ignoring duplicated webhook %s", key)
+                return web.json_response({"message": "Webhook received"})
+
+            # Acknowledge straight away, the Discord side is handled by the workers
+            try:
+                self.queues[bookingid % len(self.queues)].put_nowait((time.perf_counter(), data))
+            except asyncio.QueueFull:
+                self.dedup.forget(key) # let the retry through
+                self.stats["rejected"] += 1
+                logger.warning("Webhook queue is full, rejecting booking ID: %s", bookingid)
+                return web.json_response(
+                    {"error": "Too many pending webhooks"},
+                    status=503,
+                    headers={"Retry-After": str(WEBHOOK_RETRY_AFTER)}
+                )
+
+            self.stats["max_depth"] = max(self.stats["max_depth"], self.queueDepth())
             return web.json_response({"message": "Webhook received"})
             
         except Exception:
@@ -67,15 +182,96 @@ class WebhookServer(commands.Cog):
             return web.json_response({"error": "Internal server error"}, status=500)
 
     async def health_handler(self, request):
-        return web.json_response({"status": "healthy"})
+        return web.json_response({"status": "healthy", "webhooks": {**self.stats, "depth": self.queueDepth()}})
+
+    async def metrics_handler(self, request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def memory_handler(self, request):
+        expected_bearer = os.getenv("WEBHOOK_BEARER")
+        if expected_bearer and request.headers.get("Authorization", "") != f"Bearer {expected_bearer}":
+            return web.json_response({"error": "Unauthorized"}, status=401)
 
+        try:
+            limit = int(request.query.get("limit", "15"))
+        except ValueError:
+            return web.json_response({"error": "Invalid limit"}, status=400)
+
+        # The report walks the whole heap, keep the event loop free for heartbeats and webhooks meanwhile
+        cache = memory.DiscordCacheSizes(self.bot) if self.bot is not None else None
+        report = await asyncio.to_thread(memory.MemoryReport, cache, limit, since_start=request.query.get("since") == "start")
+        return web.Response(text=report, content_type="text/plain", charset="utf-8")
+
+    async def handOff(self, bookingid: int, data: dict):
+        """
+        Forwards the webhook to the replica owning the booking.
 
-    async def checkout_bookable(self, data):
+        Returns:
+            Optional[web.Response]: The owner's answer, None if the booking isn't owned by another replica
+        """
+        try:
+            owner = await self.state.owner(bookingid)
+            if owner is None or owner == self.replica:
+                return None
+
+            if self._session is None or self._session.closed:
+                self._session = ClientSession(timeout=ClientTimeout(total=WEBHOOK_FORWARD_TIMEOUT))
+
+            headers = {FORWARDED_HEADER: self.replica}
+            if os.getenv("WEBHOOK_BEARER"):
+                headers["Authorization"] = f"Bearer {os.getenv('WEBHOOK_BEARER')}"
+
+            async with self._session.post(owner, json=data, headers=headers) as response:
+                body = await response.read()
+                self.stats["forwarded"] += 1
+                logger.info("Handed webhook for booking %s over to %s (%s)", bookingid, owner, response.status)
+                retry_after = response.headers.get("Retry-After")
+                return web.Response(
+                    body=body,
+                    status=response.status,
+                    content_type="application/json",
+                    headers={"Retry-After": retry_after} if retry_after else None
+                )
+
+        except (ClientError, asyncio.TimeoutError) as e:
+            # the owner (or the state backend) is unreachable, have the Matcha API retry later
+            logger.warning("Unable to hand over webhook for booking %s: %s", bookingid, e)
+            return web.json_response(
+                {"error": "Owner replica unavailable"},
+                status=503,
+                headers={"Retry-After": str(WEBHOOK_RETRY_AFTER)}
+            )
+
+    @staticmethod
+    def dedupKey(bookingid: int, data: dict) -> tuple:
+        return (bookingid, data.get("status"), data.get("eventID"))
+
+    def queueDepth(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    async def worker(self, queue: asyncio.Queue):
+        """Process queued webhooks one at a time"""
+        while True:
+            received, data = await queue.get()
+            try:
+                await self.checkout_bookable(data, received)
+                self.stats["processed"] += 1
+            except Exception:
+                # The backend already got its 200 and won't retry, the key is kept so a duplicate can't
+                # slip through, the sweeper and the reconciler recover bookings whose webhook failed
+                self.stats["failed"] += 1
+                logger.exception("Error processing webhook for booking ID: %s", data.get("bookingID"))
+            finally:
+                queue.task_done()
+
+
+    async def checkout_bookable(self, data, received: float = None):
         """
         Process the incoming webhook data.
         
         Args:
             data (dict): The JSON data received from the webhook.
+            received (float, optional): time.perf_counter() when the webhook was received
         """
         bookingid = int(data.get("bookingID"))
 
@@ -84,32 +280,28 @@ class WebhookServer(commands.Cog):
             logger.warning("Received webhook for unknown/duplicated booking ID: %s", bookingid)
             return
 
+        # Occupancy changed upstream, the next /status should see it
+        api.InvalidateRegionCache()
+
         # requires the received json to be started and status for the booker is starting
-        if data.get("status") == "started" and self.booker[bookingid].getStatus() == "starting":
-            serverDetails = data.get("details", {})
-            details = {
-                "address": serverDetails.get("address"),
-                "port": serverDetails.get("port"),
-                "stv_port": serverDetails.get("stv_port"),
-                "sdr_ipv4": serverDetails.get("sdr_ipv4"),
-                "sdr_port": serverDetails.get("sdr_port"),
-                "sv_password": serverDetails.get("sv_password"),
-                "instance": data.get("instance"),
-                "region": self.booker[bookingid].getRegion(),
-                "bookingid": bookingid
-            }
-
-            await self.sendServerDetails(
-                self.booker[bookingid].getDiscordID(),
-                self.booker[bookingid].getMessageObject(),
-                details
-            )
+        entry = self.booker[bookingid]
+        if data.get("status") == "started" and entry.claimDelivery():
+            details = api.ParseServerDetails(data, bookingid, entry.getRegion())
 
-            logger.info("Booking %s started for user %s", bookingid, self.booker[bookingid].getDiscordID())
+            try:
+                if not await self.sendServerDetails(entry.getDiscordID(), entry.getMessageObject(), details):
+                    return # couldn't be delivered, the booking was closed
 
-            self.booker[bookingid].setStatus("started")
+                if received is not None:
+                    metrics.WEBHOOK_DELIVERY_LATENCY.observe(time.perf_counter() - received)
 
-        # If received duplicated webhook, ignore
+                logger.info("Booking %s started for user %s", bookingid, entry.getDiscordID())
+
+                entry.setStatus("started")
+            finally:
+                entry.delivering = False
+
+        # Duplicated webhook, or the details are already being delivered by the sweeper or the reconciler
         elif data.get("status") == "started":
             return
         
@@ -142,7 +334,11 @@ class WebhookServer(commands.Cog):
         app = web.Application(middlewares=[self.error_middleware])
         app.router.add_post('/webhook', self.webhook_handler)
         app.router.add_get('/health', self.health_handler)
+        app.router.add_get('/metrics', self.metrics_handler)
+        app.router.add_get('/memory', self.memory_handler)
         
+        self.workers = [asyncio.create_task(self.worker(queue)) for queue in self.queues]
+
         runner = web.AppRunner(app)
         await runner.setup()
         self.site = web.TCPSite(runner, '0.0.0.0', WEBHOOK_PORT)
@@ -156,6 +352,12 @@ class WebhookServer(commands.Cog):
         if self.site:
             asyncio.ensure_future(self.site.stop())
 
+        for task in self.workers:
+            task.cancel()
+
+        if self._session is not None:
+            asyncio.ensure_future(self._session.close())
+
 async def setup(bot):
     """Setup function for the cog"""
     webhook_cog = WebhookServer(bot)